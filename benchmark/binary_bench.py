@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/binary_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# sutils._binary benchmarks. Run with ``python benchmark/binary_bench.py``.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import timeit
+
+from sutils.primitives import qdict, qlist
+from sutils import _json, _binary
+
+
+# -----------------------------------------------------------------------------
+# _report
+# -----------------------------------------------------------------------------
+
+def _report(name, func, number = 5):
+    best = min(timeit.repeat(func, number = 1, repeat = number))
+    print("{:<40} {:>10.2f} ms".format(name, best * 1e3))
+
+
+# -----------------------------------------------------------------------------
+# bench_roundtrip
+# -----------------------------------------------------------------------------
+
+def bench_roundtrip(count = 100000):
+    print("-- dumps + loads of a qdict tree")
+    tree = qdict(items = qlist([ qdict(id = i, name = "item%d" % i, tags = qlist([ qdict(k = "x") ])) for i in range(count) ]))
+    _report("_json (%s)" % _json.get_backend().name, lambda: _json.loads(_json.dumps(tree, fast = True)))
+    _report("_binary", lambda: _binary.loads(_binary.dumps(tree)))
+    blobs = qdict(("blob%d" % i, b"x" * 1000000) for i in range(100))
+    _report("_binary 100MB of bytes, in-band", lambda: _binary.loads(_binary.dumps(blobs)))
+    def out_of_band():
+        buffers = []
+        return _binary.loads(_binary.dumps(blobs, buffer_callback = buffers.append), buffers = buffers)
+    _report("_binary 100MB of bytes, out-of-band", out_of_band)
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    bench_roundtrip()
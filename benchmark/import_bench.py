@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/import_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# sutils import time benchmarks, measured with ``python -X importtime`` in a
+# fresh interpreter per run. Run with ``python benchmark/import_bench.py``;
+# ``--max-ms`` and ``--max-star-ms`` turn it into a regression check for
+# ``import sutils`` and ``from sutils import *``. Only the former is lazy, the
+# star import resolves every exported name and imports the submodules.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+import argparse
+import subprocess
+
+
+# -----------------------------------------------------------------------------
+# configuration
+# -----------------------------------------------------------------------------
+
+STATEMENTS = (
+    "import sutils",
+    "from sutils import qdict",
+    "from sutils import logged",
+    "from sutils import *",
+    "import sutils.packageinfo",
+    "import sutils.thread_utils",
+)
+
+
+# -----------------------------------------------------------------------------
+# importtime
+# -----------------------------------------------------------------------------
+
+def importtime(statement):
+    """Returns the summed cumulative time of the top level imports of `statement` and the interpreter startup, in ms"""
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(sys.path))
+    proc = subprocess.run([ sys.executable, "-X", "importtime", "-c", statement ], env = env,
+        stderr = subprocess.PIPE, universal_newlines = True, check = True)
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        # top level imports only, nested ones are part of their cumulative time
+        if name.startswith("  "):
+            continue
+        total += int(cumulative_us)
+    return total / 1e3
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--repeat", type = int, default = 7)
+    parser.add_argument("--max-ms", type = float, default = None, help = "fail if `import sutils` takes longer")
+    parser.add_argument("--max-star-ms", type = float, default = None, help = "fail if `from sutils import *` takes longer")
+    args = parser.parse_args()
+    baseline = min(importtime("pass") for _ in range(args.repeat))
+    results = {}
+    for statement in STATEMENTS:
+        results[statement] = best = min(importtime(statement) for _ in range(args.repeat)) - baseline
+        print("{:<40} {:>10.2f} ms".format(statement, best))
+    res = 0
+    for statement, limit in (( "import sutils", args.max_ms ), ( "from sutils import *", args.max_star_ms )):
+        if limit is not None and results[statement] > limit:
+            print("{} took {:.2f} ms, limit is {:.2f} ms".format(statement, results[statement], limit))
+            res = 1
+    return res
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/json_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# sutils._json benchmarks. Run with ``python benchmark/json_bench.py``.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import io
+import json
+import datetime
+import timeit
+
+from sutils import _json
+
+
+# -----------------------------------------------------------------------------
+# _report
+# -----------------------------------------------------------------------------
+
+def _report(name, func, size, number = 5):
+    best = min(timeit.repeat(func, number = 1, repeat = number))
+    print("{:<40} {:>10.2f} ms {:>10.1f} MB/s".format(name, best * 1e3, size / best / 1e6))
+
+
+# -----------------------------------------------------------------------------
+# _document
+# -----------------------------------------------------------------------------
+
+def _document(count = 100000):
+    return json.dumps(dict(
+        meta = dict(count = count),
+        items = [ dict(id = i, name = "item%d" % i, tags = [ dict(k = "x") ]) for i in range(count) ],
+    ))
+
+
+# -----------------------------------------------------------------------------
+# bench_loads
+# -----------------------------------------------------------------------------
+
+def bench_loads():
+    print("-- loads (many small objects)")
+    document = _document()
+    size = len(document)
+    _report("json.loads", lambda: json.loads(document), size)
+    _report("_json.loads", lambda: _json.loads(document), size)
+    _report("_json.loads(lazy = True) + d.meta", lambda: _json.loads(document, lazy = True).meta, size)
+
+
+# -----------------------------------------------------------------------------
+# bench_iterload
+# -----------------------------------------------------------------------------
+
+def bench_iterload(count = 100000):
+    print("-- streaming")
+    array = json.dumps([ dict(id = i, name = "item%d" % i) for i in range(count) ])
+    lines = "\n".join(json.dumps(dict(id = i, name = "item%d" % i)) for i in range(count))
+    _report("_json.load (array)", lambda: _json.load(io.StringIO(array)), len(array))
+    _report("_json.iterload (array)", lambda: sum(1 for i in _json.iterload(io.StringIO(array))), len(array))
+    _report("_json.load_lines", lambda: _json.load_lines(io.StringIO(lines)), len(lines))
+
+
+# -----------------------------------------------------------------------------
+# bench_backends
+# -----------------------------------------------------------------------------
+
+def bench_backends():
+    print("-- backends (qdict payload)")
+    document = _document()
+    payload = _json.loads(document)
+    for name in list(_json.BACKENDS):
+        try:
+            _json.set_backend(name)
+        except ImportError:
+            print("{:<40} {:>10}".format(name, "n/a"))
+            continue
+        _report(name + " dumps", lambda: _json.dumps(payload, fast = True), len(document))
+        _report(name + " loads(lazy = True, fast = True)", lambda: _json.loads(document, lazy = True, fast = True), len(document))
+    _json.set_backend()
+
+
+# -----------------------------------------------------------------------------
+# bench_extended_encoder
+# -----------------------------------------------------------------------------
+
+def bench_extended_encoder(count = 100000):
+    print("-- dumps with extended_encoder (mixed objects)")
+    records = [ dict(when = datetime.datetime(2020, 1, 1), error = ValueError(i), value = i) for i in range(count) ]
+    for name in list(_json.BACKENDS):
+        try:
+            _json.set_backend(name)
+        except ImportError:
+            continue
+        size = len(_json.dumps(records, fast = True))
+        _report(name + " dumps", lambda: _json.dumps(records, fast = True), size)
+    _json.set_backend()
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    bench_loads()
+    bench_iterload()
+    bench_backends()
+    bench_extended_encoder()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/logging_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# sutils.logging_utils formatter benchmarks. Run with ``python benchmark/logging_bench.py``.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import os
+import json
+import timeit
+import logging
+
+from sutils.logging_utils import LOG_FORMATS, LOG_FIELDS, JsonFormatter
+from sutils import _json
+
+
+# -----------------------------------------------------------------------------
+# _report
+# -----------------------------------------------------------------------------
+
+def _report(name, func, count):
+    best = min(timeit.repeat(func, number = 1, repeat = 5))
+    print("{:<40} {:>10.2f} ms {:>10.0f} records/s".format(name, best * 1e3, count / best))
+
+
+# -----------------------------------------------------------------------------
+# NaiveJsonFormatter
+# -----------------------------------------------------------------------------
+
+class NaiveJsonFormatter(logging.Formatter):
+    """What is usually hand rolled: a fresh dict and stdlib json per record"""
+
+    def format(self, record):
+        record.message = record.getMessage()
+        record.asctime = self.formatTime(record)
+        return json.dumps({ name: getattr(record, name) for name in LOG_FIELDS.full })
+
+
+# -----------------------------------------------------------------------------
+# bench_formatters
+# -----------------------------------------------------------------------------
+
+def bench_formatters(count = 100000):
+    print("-- format %d records (json backend: %s)" % (count, _json.get_backend().name))
+    logger = logging.getLogger("bench.logging")
+    records = [ logger.makeRecord(logger.name, logging.INFO, __file__, 1, "request %d done in %.3f ms", (i, i / 7.0), None) for i in range(count) ]
+    formatters = (
+        ( "text (LOG_FORMATS.full)", logging.Formatter(LOG_FORMATS.full) ),
+        ( "naive json", NaiveJsonFormatter() ),
+        ( "JsonFormatter (LOG_FIELDS.full)", JsonFormatter("full") ),
+    )
+    for name, formatter in formatters:
+        _report(name, lambda: [ formatter.format(record) for record in records ], count)
+    print("-- log %d records to %s" % (count, os.devnull))
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    with open(os.devnull, "w") as stream:
+        handler = logging.StreamHandler(stream)
+        logger.addHandler(handler)
+        for name, formatter in formatters:
+            handler.setFormatter(formatter)
+            def run():
+                for i in range(count):
+                    logger.info("request %d done in %.3f ms", i, i / 7.0)
+            _report(name, run, count)
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    bench_formatters()
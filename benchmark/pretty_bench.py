@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/pretty_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# PrettyObject repr benchmarks. Run with ``python benchmark/pretty_bench.py``.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import timeit
+
+from sutils.primitives import PrettyObject
+
+
+# -----------------------------------------------------------------------------
+# _report
+# -----------------------------------------------------------------------------
+
+def _report(name, func, number = 100000):
+    best = min(timeit.repeat(func, number = number, repeat = 5))
+    print("{:<40} {:>10.3f} us".format(name, best / number * 1e6))
+
+
+# -----------------------------------------------------------------------------
+# sample classes
+# -----------------------------------------------------------------------------
+
+class Request(PrettyObject):
+    __pretty_fields__ = [ 'method', 'path', 'status:03d', 'size' ]
+
+    def __init__(self):
+        self.method, self.path, self.status, self.size = 'GET', '/index.html', 200, 5120
+
+
+class Partial(PrettyObject):
+    __pretty_fields__ = [ 'method', 'path', 'status', 'size' ]
+
+    def __init__(self):
+        # status and size are not set yet
+        self.method, self.path = 'GET', '/index.html'
+
+
+class Slotted(PrettyObject):
+    __pretty_format__ = PrettyObject.__PRETTY_FORMATS__.minimal
+    __slots__ = ( 'x', 'y' )
+
+    def __init__(self):
+        self.x, self.y = 1, 2
+
+
+# -----------------------------------------------------------------------------
+# bench_repr
+# -----------------------------------------------------------------------------
+
+def bench_repr():
+    print("-- repr of a PrettyObject")
+    for obj in (Request(), Partial(), Slotted()):
+        name = type(obj).__name__
+        _report("%s generic" % name, lambda: PrettyObject.__repr__(obj))
+        _report("%s compiled" % name, lambda: repr(obj))
+        _report("%s str()" % name, lambda: str(obj))
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    bench_repr()
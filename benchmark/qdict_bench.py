@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/qdict_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# qdict micro benchmarks. Run with ``python benchmark/qdict_bench.py``.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import timeit
+
+from sutils.primitives import qdict, fastqdict
+
+
+# -----------------------------------------------------------------------------
+# _report
+# -----------------------------------------------------------------------------
+
+def _report(name, stmt, number, **context):
+    best = min(timeit.repeat(stmt, globals = context, number = number, repeat = 5))
+    print("{:<40} {:>10.1f} ns".format(name, best / number * 1e9))
+
+
+# -----------------------------------------------------------------------------
+# bench_attribute_access
+# -----------------------------------------------------------------------------
+
+def bench_attribute_access(number = 1000000):
+    # fastqdict reads run a python level __getattribute__: they are several
+    # times faster than qdict, but still several times slower than d['a']
+    # (166 ns against 17 ns for dict[key] on the last run)
+    print("-- attribute access")
+    _report("dict[key]", "d['a']", number, d = dict(a = 1))
+    for cls in (qdict, fastqdict):
+        d = cls(a = 1)
+        _report(cls.__name__ + " get d.a", "d.a", number, d = d)
+        _report(cls.__name__ + " set d.a = 1", "d.a = 1", number, d = d)
+        _report(cls.__name__ + " d.get('a')", "d.get('a')", number, d = d)
+        _report(cls.__name__ + " cls(a = 1)", "cls(a = 1)", number, cls = cls)
+
+
+# -----------------------------------------------------------------------------
+# _legacy_update
+# -----------------------------------------------------------------------------
+
+def _legacy_update( self, source, recursive = False, add_keys = True, convert_to_qdict = False ):
+    """The recursive qdict.update() engine shipped up to 0.7.1 (add_keys path)"""
+    for k, nv in source.items():
+        if convert_to_qdict and isinstance(nv, dict) and (not isinstance(nv, qdict)):
+            nv = _legacy_update(qdict(), nv, recursive, add_keys, convert_to_qdict)
+        if isinstance(nv, dict) and (k in self):
+            cv = self[k]
+            if isinstance(cv, dict) and convert_to_qdict:
+                cv = qdict(cv)
+                self[k] = cv
+            if isinstance(cv, qdict):
+                _legacy_update(cv, nv, recursive, add_keys, convert_to_qdict)
+                continue
+            if isinstance(cv, dict):
+                cv.update(nv)
+                continue
+        if convert_to_qdict and isinstance(nv, list):
+            for i in range(len(nv)):
+                if isinstance(nv[i], qdict): continue
+                if isinstance(nv[i], dict):
+                    nv[i] = _legacy_update(qdict(), nv[i], True, add_keys, convert_to_qdict)
+        self[k] = nv
+    return self
+
+
+# -----------------------------------------------------------------------------
+# documents
+# -----------------------------------------------------------------------------
+
+def _wide_document():
+    return { "key%d" % i: { "value": i, "nested": { "flag": True } } for i in range(50000) }
+
+def _deep_document():
+    document = leaf = {}
+    for i in range(900):
+        leaf["level"] = { "index": i }
+        leaf = leaf["level"]
+    return document
+
+def _list_document():
+    return { "items": [ { "id": i, "tags": [ { "name": "t" } ] } for i in range(20000) ] }
+
+
+# -----------------------------------------------------------------------------
+# bench_update_recursive
+# -----------------------------------------------------------------------------
+
+def bench_update_recursive(number = 5):
+    print("-- qdict.update(recursive = True, convert_to_qdict = True)")
+    for name, make_document in (("wide", _wide_document), ("deep", _deep_document), ("lists", _list_document)):
+        base = qdict().update(make_document(), True, True, True)
+        for engine, update in (("legacy", _legacy_update), ("qdict", qdict.update)):
+            documents = [ make_document() for i in range(number) ]
+            def run():
+                update(qdict(base), documents.pop(), True, True, True)
+            best = min(timeit.repeat(run, number = 1, repeat = number))
+            print("{:<40} {:>10.2f} ms".format(name + " " + engine, best * 1e3))
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    bench_attribute_access()
+    bench_update_recursive()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: benchmark/stream_bench.py
+# file-version: 1.0
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# sutils.thread_utils stream reader benchmarks: collects the output of 500
+# child processes. Run with ``python benchmark/stream_bench.py``.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import time
+import asyncio
+import threading
+import subprocess
+
+from sutils.thread_utils import NonBlockingStreamReader, StreamMultiplexer, AsyncStreamReader
+
+
+# -----------------------------------------------------------------------------
+# configuration
+# -----------------------------------------------------------------------------
+
+CHILDREN = 500
+LINES = 2000
+
+# a burst of lines, a pause, then a second burst, from a light-weight child;
+# the pause is long enough to have all children running at the same time
+CHILD = [ "/bin/sh", "-c", "seq 1 {0}; sleep 2; seq 1 {0}".format(LINES // 2) ]
+
+
+# -----------------------------------------------------------------------------
+# _collect
+# -----------------------------------------------------------------------------
+
+def _collect(make_reader):
+    start = time.perf_counter()
+    procs, readers = [], []
+    for _ in range(CHILDREN):
+        procs.append(subprocess.Popen(CHILD, stdout = subprocess.PIPE))
+        readers.append(make_reader(procs[-1].stdout))
+    peak_threads = threading.active_count()
+    counts = [ 0 ] * CHILDREN
+    pending = set(range(CHILDREN))
+    while pending:
+        idle = True
+        for i in list(pending):
+            while True:
+                line = readers[i].readline()
+                if line is None:
+                    break
+                idle = False
+                counts[i] += 1
+            if counts[i] == LINES:
+                pending.discard(i)
+        peak_threads = max(peak_threads, threading.active_count())
+        if idle:
+            time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    for proc in procs:
+        proc.wait()
+        proc.stdout.close()
+    return elapsed, peak_threads
+
+
+# -----------------------------------------------------------------------------
+# _collect_async
+# -----------------------------------------------------------------------------
+
+def _collect_async():
+    async def consume(reader):
+        count = 0
+        while True:
+            lines = await reader.read_lines(1000)
+            if not lines:
+                return count
+            count += len(lines)
+    async def main():
+        start = time.perf_counter()
+        procs, tasks = [], []
+        for _ in range(CHILDREN):
+            procs.append(subprocess.Popen(CHILD, stdout = subprocess.PIPE))
+            tasks.append(asyncio.ensure_future(consume(AsyncStreamReader(procs[-1].stdout))))
+        peak_threads = threading.active_count()
+        counts = await asyncio.gather(*tasks)
+        assert counts == [ LINES ] * CHILDREN
+        elapsed = time.perf_counter() - start
+        for proc in procs:
+            proc.wait()
+        return elapsed, peak_threads
+    return asyncio.run(main())
+
+
+# -----------------------------------------------------------------------------
+# bench_readers
+# -----------------------------------------------------------------------------
+
+def bench_readers():
+    print("-- %d children, %d lines each" % (CHILDREN, LINES))
+    threading.excepthook = lambda args: None    # NonBlockingStreamReader threads die at EOF
+    multiplexer = StreamMultiplexer()
+    for name, make_reader in (
+            ( "NonBlockingStreamReader", NonBlockingStreamReader ),
+            ( "MultiplexedStreamReader", multiplexer.reader ) ):
+        elapsed, threads = _collect(make_reader)
+        print("{:<30} {:>10.2f} s {:>6d} threads".format(name, elapsed, threads))
+    multiplexer.close()
+    elapsed, threads = _collect_async()
+    print("{:<30} {:>10.2f} s {:>6d} threads".format("AsyncStreamReader", elapsed, threads))
+
+
+# -----------------------------------------------------------------------------
+# main
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    bench_readers()
@@ -20,3 +20,11 @@ linkable::
 	@echo "libmakepy: making this package linkable using genenv..."
 	$(GENENV) link
 
+
+
+# -----------------------------------------------------------------------
+# target: bench-%
+# -----------------------------------------------------------------------
+
+bench-%:: benchmark/%_bench.py deps
+	source activate && python $<
@@ -26,7 +26,70 @@ __license__ = "GPLv3+"
 __uri__ = "https://github.com/ultralightweight/sutils"
 __version__ = "0.7.1"
 
-from .primitives import *
-from .logging_utils import *
-from .string_utils import *
-from .meta_patterns import *
+
+# -----------------------------------------------------------------------------
+# lazy exports
+# -----------------------------------------------------------------------------
+#
+# The public names of the submodules below are exported from the package, but
+# a submodule is only imported when one of its names is first used (PEP 562).
+# The table has to be kept in sync with the __all__ of the submodules, this is
+# checked by test/init_test.py.
+#
+# Only ``import sutils`` and ``from sutils import name`` are lazy:
+# ``from sutils import *`` resolves every name of __all__, so it imports the
+# submodules below as before.
+
+import sys as _sys
+
+_EXPORTS = {
+    'primitives': (
+        'qlist', 'NA', 'qdict', 'fastqdict', 'lazyqdict', 'lazyqlist', 'wrap_lazy',
+        'layeredqdict', 'deeplayeredqdict', 'ObjectDict', 'SmartEnum',
+        'weakproperty', 'cachedproperty', 'asynccachedproperty', 'PrettyObject',
+    ),
+    'logging_utils': (
+        'LOG_FORMATS', 'LOG_FIELDS', 'RateLimitFilter', 'logged', 'lazyrepr', 'LazyLogRecord', 'enable_lazy_log_records',
+        'BoundedQueueHandler', 'BatchingStreamHandler', 'BatchingFileHandler', 'QueueLogListener',
+        'setup_queue_logging', 'JsonFormatter', 'MethodStats', 'INSTRUMENTED', 'instrumented',
+        'report_instrumentation',
+    ),
+    'string_utils': (
+        'camelize', 'underscorize', 'titleize', 'firstline', 'format_filesize',
+        'find_common_prefix',
+    ),
+    'meta_patterns': ( 'MergedDefaultOptions', ),
+}
+
+_SUBMODULES = (
+    '_binary', '_json', 'annotations', 'logging_utils', 'meta_patterns',
+    'packageinfo', 'primitives', 'proxies', 'shared_utils', 'string_utils',
+    'thread_utils',
+)
+
+_LAZY_NAMES = { name: module for module, names in _EXPORTS.items() for name in names }
+
+# the star import exported the submodules whose names were imported eagerly too
+__all__ = list(_LAZY_NAMES) + list(_EXPORTS)
+
+
+def _import(module):
+    # plain __import__ keeps importlib out of the startup path
+    name = __name__ + '.' + module
+    __import__(name)
+    return _sys.modules[name]
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is not None:
+        value = getattr(_import(module), name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return _import(name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES) | set(_SUBMODULES))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: sutils/_binary.py
+# file-version: 3.1
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# ---------------------------------------------------
+# imports
+# ---------------------------------------------------    
+
+import io
+import array
+import pickle
+
+from .primitives import qlist
+
+
+# ---------------------------------------------------
+# exports
+# ---------------------------------------------------    
+
+__all__ = qlist()
+
+
+# ---------------------------------------------------
+# configuration
+# ---------------------------------------------------    
+
+PROTOCOL = 5
+OUT_OF_BAND_THRESHOLD = 64 * 1024
+
+# the only globals safe_load() / safe_loads() resolve: the containers and the
+# scalar types of decoded yaml / json documents, none of them runs code
+SAFE_GLOBALS = frozenset([
+    ( 'sutils.primitives', 'qdict' ),
+    ( 'sutils.primitives', 'qlist' ),
+    ( 'builtins', 'set' ),
+    ( 'builtins', 'frozenset' ),
+    ( 'builtins', 'bytearray' ),
+    ( 'builtins', 'complex' ),
+    ( 'datetime', 'date' ),
+    ( 'datetime', 'datetime' ),
+    ( 'datetime', 'time' ),
+    ( 'datetime', 'timedelta' ),
+    ( 'datetime', 'timezone' ),
+])
+
+
+# ---------------------------------------------------
+# _OutOfBand
+# ---------------------------------------------------    
+
+class _OutOfBand(object):
+    """Pickles the wrapped bytes / bytearray as an out-of-band buffer"""
+
+    __slots__ = ( 'value', )
+
+    def __init__( self, value ):
+        self.value = value
+
+    def __reduce_ex__( self, protocol ):
+        rebuild = _rebuild_bytearray if self.value.__class__ is bytearray else _rebuild_bytes
+        return ( rebuild, ( pickle.PickleBuffer( self.value ), ) )
+
+
+def _buffer_owner( buffer ):
+    # the object exporting the buffer handed to load(), e.g. the bytearray
+    # wrapped by the PickleBuffer the buffer_callback received
+    with memoryview( buffer ) as view:
+        return view.obj
+
+
+def _rebuild_bytearray( buffer ):
+    """Returns the bytearray behind the buffer as is (the protocol 5 zero-copy
+    pattern), the loaded value shares its memory with it. Any other buffer
+    (bytes, mmap, shared memory) is copied into a new bytearray.
+    """
+    owner = _buffer_owner( buffer )
+    if owner.__class__ is bytearray:
+        return owner
+    return bytearray( buffer )
+
+
+def _rebuild_bytes( buffer ):
+    """Returns the bytes behind the buffer as is, any other buffer is copied:
+    a bytes object cannot be created over foreign memory.
+    """
+    owner = _buffer_owner( buffer )
+    if owner.__class__ is bytes:
+        return owner
+    return bytes( buffer )
+
+
+def _rebuild_array( typecode, buffer ):
+    """Returns the array behind the buffer as is, any other buffer is copied:
+    an array.array cannot be created over foreign memory.
+    """
+    owner = _buffer_owner( buffer )
+    if owner.__class__ is array.array and owner.typecode == typecode:
+        return owner
+    res = array.array( typecode )
+    res.frombytes( memoryview( buffer ).cast( "B" ) )
+    return res
+
+
+# ---------------------------------------------------
+# _Pickler
+# ---------------------------------------------------    
+
+class _Pickler(pickle.Pickler):
+    """Pickler passing large bytes, bytearrays and arrays held by qdict / qlist trees out-of-band.
+
+    Exact bytes are always pickled in-band by the C pickler, so they are taken
+    out of band by the container (any dict or list subclass) holding them.
+    Objects supporting protocol 5 themselves (e.g. numpy arrays) need no help.
+    """
+
+    def __init__( self, file, buffer_callback, threshold ):
+        super(_Pickler, self).__init__( file, protocol = PROTOCOL, buffer_callback = buffer_callback )
+        self.threshold = threshold
+
+    def _wrap( self, value ):
+        cls = value.__class__
+        if ( cls is bytes or cls is bytearray ) and len( value ) >= self.threshold:
+            return _OutOfBand( value )
+        return value
+
+    def reducer_override( self, obj ):
+        if isinstance( obj, ( dict, list ) ):
+            rv = obj.__reduce_ex__( PROTOCOL )
+            if not isinstance( rv, tuple ) or len( rv ) < 4:
+                return NotImplemented
+            wrap = self._wrap
+            listitems = rv[3]
+            dictitems = rv[4] if len( rv ) > 4 else None
+            if listitems is not None:
+                listitems = ( wrap( v ) for v in listitems )
+            if dictitems is not None:
+                dictitems = ( ( k, wrap( v ) ) for k, v in dictitems )
+            return rv[:3] + ( listitems, dictitems ) + rv[5:]
+        if obj.__class__ is array.array and len( obj ) * obj.itemsize >= self.threshold:
+            return ( _rebuild_array, ( obj.typecode, pickle.PickleBuffer( obj ) ) )
+        return NotImplemented
+
+
+# ---------------------------------------------------
+# dump
+# ---------------------------------------------------    
+
+@__all__.register
+def dump( obj, fp, buffer_callback = None, threshold = OUT_OF_BAND_THRESHOLD ):
+    """Pickles obj to fp with protocol 5.
+
+    Without `buffer_callback` everything is written in-band with the plain C
+    pickler. With it, large binary payloads (see _Pickler) are handed to the
+    callback as PickleBuffers instead of being copied into the stream; the
+    same buffers must be passed to load() in the same order. Loading returns
+    the bytearrays, bytes and arrays behind the given buffers as they are,
+    sharing their memory. Buffers of any other type are copied into new
+    bytearrays, bytes and arrays, only other protocol 5 objects (e.g. numpy
+    arrays) can be rebuilt over them without a copy.
+    """
+    if buffer_callback is None:
+        return pickle.dump( obj, fp, protocol = PROTOCOL )
+    _Pickler( fp, buffer_callback, threshold ).dump( obj )
+
+
+# ---------------------------------------------------
+# dumps
+# ---------------------------------------------------    
+
+@__all__.register
+def dumps( obj, buffer_callback = None, threshold = OUT_OF_BAND_THRESHOLD ):
+    if buffer_callback is None:
+        return pickle.dumps( obj, protocol = PROTOCOL )
+    fp = io.BytesIO()
+    _Pickler( fp, buffer_callback, threshold ).dump( obj )
+    return fp.getvalue()
+
+
+# ---------------------------------------------------
+# load
+# ---------------------------------------------------    
+
+@__all__.register
+def load( fp, buffers = None ):
+    return pickle.load( fp, buffers = buffers )
+
+
+# ---------------------------------------------------
+# loads
+# ---------------------------------------------------    
+
+@__all__.register
+def loads( data, buffers = None ):
+    return pickle.loads( data, buffers = buffers )
+
+
+# ---------------------------------------------------
+# _SafeUnpickler
+# ---------------------------------------------------    
+
+class _SafeUnpickler(pickle.Unpickler):
+    """Unpickler refusing every global outside of SAFE_GLOBALS"""
+
+    def find_class( self, module, name ):
+        if ( module, name ) not in SAFE_GLOBALS:
+            raise pickle.UnpicklingError( 'global %s.%s is not allowed' % ( module, name ) )
+        return super(_SafeUnpickler, self).find_class( module, name )
+
+
+# ---------------------------------------------------
+# safe_load
+# ---------------------------------------------------    
+
+@__all__.register
+def safe_load( fp, buffers = None ):
+    """Like load(), for data read from untrusted files: only plain data trees
+    (see SAFE_GLOBALS) are accepted, anything else raises UnpicklingError.
+    """
+    return _SafeUnpickler( fp, buffers = buffers ).load()
+
+
+# ---------------------------------------------------
+# safe_loads
+# ---------------------------------------------------    
+
+@__all__.register
+def safe_loads( data, buffers = None ):
+    return _SafeUnpickler( io.BytesIO( data ), buffers = buffers ).load()
@@ -24,9 +24,15 @@
 # imports
 # ---------------------------------------------------    
 
+import codecs
+import datetime
+import os
+import uuid
 import json as _json
+from collections.abc import Mapping
+from enum import Enum
 
-from .primitives import qdict, qlist
+from .primitives import qdict, qlist, wrap_lazy, NA, NAMeta, PrettyObject
 
 
 # ---------------------------------------------------
@@ -36,22 +42,279 @@ from .primitives import qdict, qlist
 __all__ = qlist()
 
 
+# ---------------------------------------------------
+# JsonBackend
+# ---------------------------------------------------    
+
+@__all__.register
+class JsonBackend(object):
+    """Encoder / decoder backend based on the standard json module.
+
+    Other backends override loads() for plain (hook-less) decoding and dumps().
+    dump(), dumps(), and load() / loads() with ``lazy = True`` only use the
+    backend when called with ``fast = True``.
+    Whenever a backend cannot honour the given arguments or fails to encode an
+    object, it falls back to the standard library. The produced data is the
+    same with every backend, but not the text: fast backends emit compact
+    separators, do not escape non-ASCII characters and encode NaN and infinity
+    as null.
+    """
+
+    name = 'json'
+
+    def loads( self, s ):
+        return _json.loads( s )
+
+    def dumps( self, obj, **kwargs ):
+        return _json.dumps( obj, **kwargs )
+
+    def dump( self, obj, fp, **kwargs ):
+        return _json.dump( obj, fp, **kwargs )
+
+
+# ---------------------------------------------------
+# OrjsonBackend
+# ---------------------------------------------------    
+
+class OrjsonBackend(JsonBackend):
+
+    name = 'orjson'
+
+    def __init__( self ):
+        import orjson
+        self.module = orjson
+        self.loads = orjson.loads
+
+    def dumps( self, obj, default = None, sort_keys = False, indent = None, **kwargs ):
+        if kwargs or indent not in ( None, 2 ):
+            return _json.dumps( obj, default = default, sort_keys = sort_keys, indent = indent, **kwargs )
+        # datetimes and dataclasses go through `default`, as with the standard library
+        option = self.module.OPT_NON_STR_KEYS | self.module.OPT_PASSTHROUGH_DATETIME | self.module.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys:
+            option |= self.module.OPT_SORT_KEYS
+        if indent:
+            option |= self.module.OPT_INDENT_2
+        try:
+            return self.module.dumps( obj, default = default, option = option ).decode( 'utf-8' )
+        except TypeError:
+            return _json.dumps( obj, default = default, sort_keys = sort_keys, indent = indent )
+
+    def dump( self, obj, fp, **kwargs ):
+        fp.write( self.dumps( obj, **kwargs ) )
+
+
+# ---------------------------------------------------
+# UjsonBackend
+# ---------------------------------------------------    
+
+class UjsonBackend(JsonBackend):
+
+    name = 'ujson'
+    options = frozenset([ 'default', 'sort_keys', 'indent', 'ensure_ascii' ])
+
+    def __init__( self ):
+        import ujson
+        self.module = ujson
+        self.loads = ujson.loads
+
+    def dumps( self, obj, **kwargs ):
+        if not self.options.issuperset( kwargs ):
+            return _json.dumps( obj, **kwargs )
+        try:
+            return self.module.dumps( obj, escape_forward_slashes = False, **kwargs )
+        except ( TypeError, OverflowError ):
+            return _json.dumps( obj, **kwargs )
+
+    def dump( self, obj, fp, **kwargs ):
+        fp.write( self.dumps( obj, **kwargs ) )
+
+
+# ---------------------------------------------------
+# RapidjsonBackend
+# ---------------------------------------------------    
+
+class RapidjsonBackend(UjsonBackend):
+
+    name = 'rapidjson'
+
+    def __init__( self ):
+        import rapidjson
+        self.module = rapidjson
+        self.loads = rapidjson.loads
+
+    def dumps( self, obj, **kwargs ):
+        if not self.options.issuperset( kwargs ):
+            return _json.dumps( obj, **kwargs )
+        try:
+            return self.module.dumps( obj, **kwargs )
+        except ( TypeError, OverflowError, ValueError ):
+            return _json.dumps( obj, **kwargs )
+
+
+# ---------------------------------------------------
+# backend registry
+# ---------------------------------------------------    
+
+BACKENDS = qdict(
+    orjson = OrjsonBackend,
+    ujson = UjsonBackend,
+    rapidjson = RapidjsonBackend,
+    json = JsonBackend,
+)
+__all__.append( "BACKENDS" )
+
+BACKEND_ENVIRONMENT_VARIABLE = 'SUTILS_JSON_BACKEND'
+
+_backend = None
+_stdlib_backend = JsonBackend()
+
+
+@__all__.register
+def register_backend( name, factory ):
+    """Registers a backend factory (a callable raising ImportError when unavailable), selected automatically in registration order"""
+    BACKENDS[name] = factory
+    # the standard library stays the last resort
+    BACKENDS['json'] = BACKENDS.pop( 'json', JsonBackend )
+
+
+@__all__.register
+def set_backend( name = None ):
+    """Selects the backend by name, or the first available one when name is None"""
+    global _backend
+    if name:
+        _backend = BACKENDS[name]()
+        return _backend
+    for factory in BACKENDS.values():
+        try:
+            _backend = factory()
+            return _backend
+        except ImportError:
+            continue
+    _backend = JsonBackend()
+    return _backend
+
+
+@__all__.register
+def get_backend():
+    """Returns the active backend, selecting it on first use (see SUTILS_JSON_BACKEND)"""
+    return _backend or set_backend( os.environ.get( BACKEND_ENVIRONMENT_VARIABLE ) )
+
+
 # ---------------------------------------------------
 # extended_encoder
 # ---------------------------------------------------    
 
-# def extended_encoder( obj ):
-#     if isinstance(obj, datetime.datetime):
-#         return obj.isoformat()
-#     if isinstance(obj, Exception):
-#         d = __dict__ = getattr( obj, '__dict__', {} )
-#         d.update( { 'message': obj.message } )
-#         return qdict( __class__ = obj.__class__.__module__ + '.' + obj.__class__.__name__, __dict__ = d )
-#     if isinstance(obj, object):
-#         return qdict( __class__ = obj.__class__.__module__ + '.' + obj.__class__.__name__, __dict__ = getattr( obj, '__dict__', None ) )
-#         return dict( filter(  )
-#     else:
-#         raise TypeError, 'Object of type %s with value of %s is not JSON serializable' % ( type(obj), repr(obj) )
+def _qualified_name( cls ):
+    return cls.__module__ + '.' + cls.__name__
+
+def _encode_none( obj ):
+    return None
+
+def _encode_isoformat( obj ):
+    return obj.isoformat()
+
+def _encode_timedelta( obj ):
+    return obj.total_seconds()
+
+def _encode_enum( obj ):
+    return obj.value
+
+def _encode_set( obj ):
+    return list( obj )
+
+def _encode_tuple( obj ):
+    # the standard library encodes tuple subclasses (namedtuples) natively, fast backends call `default`
+    return list( obj )
+
+def _encode_str( obj ):
+    return str( obj )
+
+def _encode_type( obj ):
+    return _qualified_name( obj )
+
+def _encode_exception( obj ):
+    d = dict( getattr( obj, '__dict__', {} ) )
+    d['message'] = str( obj )
+    return qdict( __class__ = _qualified_name( obj.__class__ ), __dict__ = d )
+
+def _encode_mapping( obj ):
+    return dict( obj )
+
+def _encode_object( obj ):
+    try:
+        state = obj.__dict__
+    except AttributeError:
+        raise TypeError( 'Object of type %s is not JSON serializable' % obj.__class__.__name__ )
+    return qdict( __class__ = _qualified_name( obj.__class__ ), __dict__ = state )
+
+def _make_pretty_object_encoder( cls ):
+    fields = getattr( cls, '__pretty_fields__', None ) or getattr( cls, '__slots__', None )
+    if not fields:
+        return _encode_object
+    names = [ field.split( '!', 1 )[0].split( ':', 1 )[0] for field in fields ]
+    class_name = _qualified_name( cls )
+    def _encode_pretty_object( obj ):
+        res = qdict( __class__ = class_name )
+        for name in names:
+            res[name] = getattr( obj, name, None )
+        return res
+    return _encode_pretty_object
+
+
+# ordered ( types, encoder factory ) rules, the first matching rule wins
+ENCODERS = qlist([
+    ( ( NAMeta, NA ), lambda cls: _encode_none ),
+    ( ( datetime.datetime, datetime.date, datetime.time ), lambda cls: _encode_isoformat ),
+    ( datetime.timedelta, lambda cls: _encode_timedelta ),
+    ( Enum, lambda cls: _encode_enum ),
+    ( ( set, frozenset ), lambda cls: _encode_set ),
+    ( tuple, lambda cls: _encode_tuple ),
+    ( uuid.UUID, lambda cls: _encode_str ),
+    ( type, lambda cls: _encode_type ),
+    ( Exception, lambda cls: _encode_exception ),
+    ( Mapping, lambda cls: _encode_mapping ),
+    ( PrettyObject, _make_pretty_object_encoder ),
+    ( object, lambda cls: _encode_object ),
+])
+__all__.append( "ENCODERS" )
+
+_encoders = {}
+
+
+@__all__.register
+def register_encoder( types, factory ):
+    """Registers an encoder factory for the given type(s) ahead of the built-in ones.
+
+    The factory is called once per concrete class with the class, and returns
+    the function that encodes its instances.
+    """
+    ENCODERS.insert( 0, ( types, factory ) )
+    _encoders.clear()
+
+
+def _find_encoder( cls ):
+    for types, factory in ENCODERS:
+        if issubclass( cls, types ):
+            encoder = _encoders[cls] = factory( cls )
+            return encoder
+    raise TypeError( 'Object of type %s is not JSON serializable' % cls.__name__ )
+
+
+@__all__.register
+def extended_encoder( obj ):
+    """json ``default`` hook for datetimes, enums, exceptions, NA, mappings, PrettyObjects and arbitrary objects.
+
+    Arbitrary objects are encoded with their class name and ``__dict__``,
+    objects without a ``__dict__`` raise TypeError.
+
+    The encoder is looked up once per class and cached, later objects of the
+    same class cost a single dict lookup.
+    """
+    try:
+        encoder = _encoders[obj.__class__]
+    except KeyError:
+        encoder = _find_encoder( obj.__class__ )
+    return encoder( obj )
 
 
 # ---------------------------------------------------
@@ -59,7 +322,19 @@ __all__ = qlist()
 # ---------------------------------------------------    
     
 def extended_decoder( obj ):
-    return qdict( **obj )
+    return qdict( obj )
+
+
+# ---------------------------------------------------
+# _setdefault_decoder
+# ---------------------------------------------------    
+
+def _setdefault_decoder( kwargs ):
+    lazy = kwargs.pop( 'lazy', False )
+    if not lazy and 'object_hook' not in kwargs:
+        # the decoder passes the key-value pairs straight to qdict(), no intermediate dict is built
+        kwargs.setdefault( 'object_pairs_hook', qdict )
+    return lazy
 
 
 # ---------------------------------------------------
@@ -68,7 +343,12 @@ def extended_decoder( obj ):
 
 @__all__.register
 def load( *args, **kwargs ):
-    kwargs.setdefault( 'object_hook', extended_decoder )
+    """Decodes the JSON document read from a file object, see loads()"""
+    fast = kwargs.pop( 'fast', False )
+    if _setdefault_decoder( kwargs ):
+        if fast and len( args ) == 1 and not kwargs:
+            return wrap_lazy( get_backend().loads( args[0].read() ) )
+        return wrap_lazy( _json.load( *args, **kwargs ) )
     return _json.load( *args, **kwargs )
 
 
@@ -78,27 +358,171 @@ def load( *args, **kwargs ):
 
 @__all__.register
 def loads( *args, **kwargs ):
-    kwargs.setdefault( 'object_hook', extended_decoder )
+    """Decodes a JSON document with objects as qdicts.
+
+    With ``lazy = True`` the document is decoded into plain dicts and lists, and
+    nested objects are turned into qdicts on first access (see lazyqdict).
+    Decoding uses the standard json module, so the result does not depend on
+    the installed backends. With ``lazy = True, fast = True`` the active
+    backend decodes the document instead: it is faster, but may differ, e.g.
+    orjson rejects NaN and Infinity and turns integers over 64 bits into
+    floats. Eager decoding always uses the standard json module: its
+    object_pairs_hook builds the qdicts faster than converting the plain
+    containers produced by the other backends afterwards.
+    """
+    fast = kwargs.pop( 'fast', False )
+    if _setdefault_decoder( kwargs ):
+        if fast and len( args ) == 1 and not kwargs:
+            return wrap_lazy( get_backend().loads( args[0] ) )
+        return wrap_lazy( _json.loads( *args, **kwargs ) )
     return _json.loads( *args, **kwargs )
 
 
+# ---------------------------------------------------
+# _TextStream
+# ---------------------------------------------------    
+
+_whitespace = _json.decoder.WHITESPACE.match
+
+# the longest tail of a window a value cut in half can fail on ('-Infinit')
+_CUT_VALUE_TAIL = 10
+
+class _TextStream(object):
+    """Sliding text window over a file object opened in text or binary (utf-8) mode"""
+
+    def __init__( self, fp, chunk_size ):
+        self.read = fp.read
+        self.chunk_size = chunk_size
+        self.decoder = None
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def more( self, size = None ):
+        data = self.read( size or self.chunk_size )
+        if not data:
+            self.eof = True
+        if isinstance( data, bytes ):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder( 'utf-8' )()
+            data = self.decoder.decode( data, final = self.eof )
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return not self.eof
+
+    def skip_whitespace( self ):
+        while True:
+            self.pos = _whitespace( self.buf, self.pos ).end()
+            if self.pos < len( self.buf ) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self.more()
+
+
+# ---------------------------------------------------
+# iterload
+# ---------------------------------------------------    
+
+@__all__.register
+def iterload( fp, chunk_size = 65536, **kwargs ):
+    """Yields the elements of a top-level JSON array one by one.
+
+    Only the current element and one read chunk are kept in memory. A document
+    that is not an array is read whole and yielded as a single item. Accepts the
+    same keyword arguments as loads().
+    """
+    lazy = _setdefault_decoder( kwargs )
+    decoder = _json.JSONDecoder( **kwargs )
+    raw_decode = decoder.raw_decode
+    stream = _TextStream( fp, chunk_size )
+    if stream.skip_whitespace() != '[':
+        while stream.more():
+            pass
+        value = decoder.decode( stream.buf[stream.pos:] )
+        yield wrap_lazy( value ) if lazy else value
+        return
+    stream.pos += 1
+    if stream.skip_whitespace() == ']':
+        return
+    size = chunk_size
+    while True:
+        stream.skip_whitespace()
+        try:
+            value, end = raw_decode( stream.buf, stream.pos )
+            delimiter = _whitespace( stream.buf, end ).end()
+            char = stream.buf[delimiter:delimiter + 1]
+            # a value at the end of the window may be cut in half: a number
+            # cut at its '.' or 'e' decodes to its integer prefix, followed
+            # by something that is not a delimiter
+            if char not in ( ',', ']' ):
+                raise _json.JSONDecodeError( "Expecting ',' delimiter", stream.buf, delimiter )
+        except _json.JSONDecodeError as exc:
+            # only an error at the end of the window (or in a string running
+            # to it) can come from a value cut in half, anything else is raised
+            # without reading the rest of the file
+            if stream.eof or (len( stream.buf ) - exc.pos > _CUT_VALUE_TAIL and not exc.msg.startswith( 'Unterminated string' )):
+                raise
+            stream.more( size )
+            size *= 2
+            continue
+        size = chunk_size
+        stream.pos = delimiter + 1
+        yield wrap_lazy( value ) if lazy else value
+        if char == ']':
+            return
+
+
+# ---------------------------------------------------
+# iterload_lines
+# ---------------------------------------------------    
+
+@__all__.register
+def iterload_lines( fp, **kwargs ):
+    """Yields the documents of a JSON lines file one by one, skipping empty lines"""
+    lazy = _setdefault_decoder( kwargs )
+    decode = _json.JSONDecoder( **kwargs ).decode
+    for line in fp:
+        if isinstance( line, bytes ):
+            line = line.decode( 'utf-8' )
+        line = line.strip()
+        if not line:
+            continue
+        value = decode( line )
+        yield wrap_lazy( value ) if lazy else value
+
+
+# ---------------------------------------------------
+# load_lines
+# ---------------------------------------------------    
+
+@__all__.register
+def load_lines( fp, **kwargs ):
+    return qlist( iterload_lines( fp, **kwargs ) )
+
+
 # ---------------------------------------------------
 # dump
 # ---------------------------------------------------    
 
 @__all__.register
-def dump( *args, **kwargs ):
-    # kwargs.setdefault( 'default', extended_encoder )
-    return _json.dump( *args, **kwargs )
+def dump( obj, fp, fast = False, **kwargs ):
+    """Writes obj as JSON to fp, see dumps()"""
+    kwargs.setdefault( 'default', extended_encoder )
+    return ( get_backend() if fast else _stdlib_backend ).dump( obj, fp, **kwargs )
 
 # ---------------------------------------------------
 # dumps
 # ---------------------------------------------------    
 
 @__all__.register
-def dumps( *args, **kwargs ):
-    # kwargs.setdefault( 'default', extended_encoder )
-    return _json.dumps( *args, **kwargs )
+def dumps( obj, fast = False, **kwargs ):
+    """Encodes obj as JSON, other objects are encoded by extended_encoder.
+
+    The output is the one of the standard json module. With ``fast = True`` the
+    active backend is used: it produces the same data, but not the same text
+    (see JsonBackend).
+    """
+    kwargs.setdefault( 'default', extended_encoder )
+    return ( get_backend() if fast else _stdlib_backend ).dumps( obj, **kwargs )
 
 
 
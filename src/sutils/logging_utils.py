@@ -23,8 +23,14 @@
 # imports
 # -----------------------------------------------------------------------------
 
+import os
+import sys
+import time
+import bisect
 import logging
-from .primitives import qlist, qdict
+import functools
+import threading
+from .primitives import qlist, qdict, PrettyObject
 
 
 # -----------------------------------------------------------------------------
@@ -47,19 +53,109 @@ LOG_FORMATS = qdict(
 )
 
 
+# -----------------------------------------------------------------------------
+# LOG_FIELDS
+# -----------------------------------------------------------------------------
+
+__all__.append("LOG_FIELDS")
+LOG_FIELDS = qdict(
+    short = ( "asctime", "levelname", "name", "message" ),
+    thread = ( "asctime", "levelname", "thread", "threadName", "name", "message" ),
+    process = ( "asctime", "levelname", "process", "name", "message" ),
+    full = ( "asctime", "levelname", "process", "thread", "threadName", "name", "message" ),
+)
+
+
 # -----------------------------------------------------------------------------
 # _add_logger
 # -----------------------------------------------------------------------------
 
-def _add_logger(obj, channel = None, root_channel = None, attr_name = "__logger" ):
-    cls = obj
+def _channel_name(cls, channel = None, root_channel = None):
     channel = channel or cls.__name__
     root_channel = root_channel if root_channel is not None else cls.__module__
     if root_channel:
         channel = root_channel + '.' + channel
+    return channel
+
+
+def _add_logger(obj, channel = None, root_channel = None, attr_name = "__logger" ):
+    cls = obj
+    channel = _channel_name(cls, channel, root_channel)
     if attr_name.startswith( '__' ): 
         attr_name = '_' + cls.__name__ + '__logger'
-    setattr( obj, attr_name, logging.getLogger(channel) )
+    logger = logging.getLogger(channel)
+    setattr( obj, attr_name, logger )
+    return logger
+
+
+
+# -----------------------------------------------------------------------------
+# RateLimitFilter
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class RateLimitFilter(logging.Filter):
+    """Rate limits and samples records, separately for each call site
+
+    Every call site (file and line of the logging call) gets a token bucket
+    refilled with `rate` records per second, holding at most `burst` (default:
+    `rate`, at least 1). A record passes when there is a token left in its
+    bucket, and, when `sample` is set, with `sample` probability. Suppressed
+    records are counted: the next record passing from the same call site
+    reports them in its message and in its `suppressed` attribute, and
+    summary() returns the totals.
+
+    Being a logger filter, it only runs for records of enabled levels.
+    """
+
+    SUFFIX = " ({} similar records suppressed)"
+
+    def __init__(self, rate = None, burst = None, sample = None, clock = time.monotonic, random = None):
+        super(RateLimitFilter, self).__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 0)
+        self.sample = sample
+        self._clock = clock
+        if random is None and sample is not None:
+            # imported here to keep it out of the import time of sutils
+            from random import random
+        self._random = random
+        # ( pathname, lineno ) -> [ tokens, refill time, suppressed since last pass, suppressed total ]
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [ self.burst, self._clock(), 0, 0 ]
+            keep = self.sample is None or self._random() < self.sample
+            if keep and self.rate is not None:
+                now = self._clock()
+                tokens = min(self.burst, site[0] + (now - site[1]) * self.rate)
+                site[1] = now
+                keep = tokens >= 1
+                site[0] = tokens - 1 if keep else tokens
+            if not keep:
+                site[2] += 1
+                site[3] += 1
+                return False
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = str(record.msg) + self.SUFFIX.format(suppressed)
+        return True
+
+    def summary(self):
+        """Returns the number of suppressed records per "path:line" call site"""
+        with self._lock:
+            return qdict(( "{}:{}".format(*key), site[3] ) for key, site in self._sites.items() if site[3])
+
+    @property
+    def suppressed(self):
+        with self._lock:
+            return sum(site[3] for site in self._sites.values())
 
 
 
@@ -68,7 +164,547 @@ def _add_logger(obj, channel = None, root_channel = None, attr_name = "__logger"
 # -----------------------------------------------------------------------------
 
 @__all__.register
-def logged(obj):
-    _add_logger(obj, root_channel = '')
-    return obj
+def logged(obj = None, rate = None, burst = None, sample = None):
+    """Attaches a logger to the class as ``__logger``
+
+    Used as ``@logged`` or with options: ``@logged(rate = 10, burst = 50,
+    sample = 0.1)`` rate limits and samples the records of the logger per call
+    site, see RateLimitFilter.
+    """
+    def _logged(obj):
+        logger = _add_logger(obj, root_channel = '')
+        if rate is not None or sample is not None:
+            for old in [ f for f in logger.filters if isinstance(f, RateLimitFilter) ]:
+                logger.removeFilter(old)
+            logger.addFilter(RateLimitFilter(rate = rate, burst = burst, sample = sample))
+        return obj
+    if obj is not None:
+        return _logged(obj)
+    return _logged
+
+
+
+# -----------------------------------------------------------------------------
+# lazyrepr
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class lazyrepr(object):
+    """Defers ``func(obj)`` (repr by default) until the text is needed, then keeps it
+
+    Passing ``lazyrepr(obj)`` as a logging argument instead of ``repr(obj)``
+    means nothing is formatted for records below the enabled level.
+    """
+
+    __slots__ = ( 'obj', 'func', '_text' )
+
+    def __init__(self, obj, func = repr):
+        self.obj = obj
+        self.func = func
+
+    def __str__(self):
+        try:
+            return self._text
+        except AttributeError:
+            text = self._text = self.func(self.obj)
+            return text
+
+    __repr__ = __str__
+
+
+# -----------------------------------------------------------------------------
+# LazyLogRecord
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class LazyLogRecord(logging.LogRecord):
+    """LogRecord that formats its message once, no matter how many handlers use it
+
+    The message is formatted on the first getMessage() call, which happens
+    only when a handler emits the record. It is recomputed only if a filter
+    replaces `msg` or `args`. The cache is kept in a slot, not in __dict__,
+    and left out when the record is pickled or copied.
+    """
+
+    __slots__ = ( '_message_cache', )
+
+    def getMessage(self):
+        try:
+            msg, args, message = self._message_cache
+            if msg is self.msg and args is self.args:
+                return message
+        except AttributeError:
+            pass
+        message = super(LazyLogRecord, self).getMessage()
+        self._message_cache = ( self.msg, self.args, message )
+        return message
+
+    def __getstate__(self):
+        # the default state would add the slots to __dict__
+        return self.__dict__
+
+
+@__all__.register
+def enable_lazy_log_records():
+    """Makes logging create LazyLogRecords, returns the previous record factory"""
+    previous = logging.getLogRecordFactory()
+    logging.setLogRecordFactory(LazyLogRecord)
+    return previous
+
+
+
+# -----------------------------------------------------------------------------
+# BoundedQueueHandler
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class BoundedQueueHandler(logging.Handler):
+    """Puts records on a bounded queue, to be emitted by a QueueLogListener
+
+    When the queue is full, the "drop" policy discards the record and counts
+    it in `dropped`, the "block" policy waits for free space (at most
+    `timeout` seconds, then drops). Records are queued as they are, nothing
+    is formatted on the logging thread: the listener formats them later, so
+    objects passed as args should not be mutated after logging them.
+    """
+
+    POLICIES = ( 'drop', 'block' )
+
+    def __init__(self, queue, policy = 'drop', timeout = None, level = logging.NOTSET):
+        if policy not in self.POLICIES:
+            raise ValueError("unknown queue policy: {!r}".format(policy))
+        super(BoundedQueueHandler, self).__init__(level)
+        self.queue = queue
+        self.policy = policy
+        self.timeout = timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        # imported here to keep it out of the import time of sutils
+        from queue import Full
+        self._full = Full
+
+    def prepare(self, record):
+        return record
+
+    def handle(self, record):
+        # the queue does its own locking, the handler lock is not needed
+        rv = self.filter(record)
+        if rv:
+            if isinstance(rv, logging.LogRecord):
+                record = rv
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            if self.policy == 'drop':
+                self.queue.put_nowait(self.prepare(record))
+            else:
+                self.queue.put(self.prepare(record), True, self.timeout)
+        except self._full:
+            with self._dropped_lock:
+                self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+# -----------------------------------------------------------------------------
+# BatchingStreamHandler
+# -----------------------------------------------------------------------------
+
+class _BatchingMixin(object):
+    """Collects formatted records and writes them to the stream in one call
+    per `batch_size` records, or when flushed.
+    """
+
+    def _init_batching(self, batch_size):
+        self.batch_size = batch_size
+        self._batch = []
+
+    def emit(self, record):
+        try:
+            self._batch.append(self.format(record) + self.terminator)
+            if len(self._batch) >= self.batch_size:
+                self._write_batch()
+        except Exception:
+            self.handleError(record)
+
+    def _write_batch(self):
+        batch, self._batch = self._batch, []
+        if batch:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(''.join(batch))
+            self.stream.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write_batch()
+        finally:
+            self.release()
+
+    def close(self):
+        # FileHandler.close() only flushes an open stream, the pending batch
+        # of a delayed handler would be lost
+        self.flush()
+        super(_BatchingMixin, self).close()
 
+
+@__all__.register
+class BatchingStreamHandler(_BatchingMixin, logging.StreamHandler):
+
+    def __init__(self, stream = None, batch_size = 100):
+        super(BatchingStreamHandler, self).__init__(stream)
+        self._init_batching(batch_size)
+
+
+@__all__.register
+class BatchingFileHandler(_BatchingMixin, logging.FileHandler):
+
+    def __init__(self, filename, mode = 'a', encoding = None, delay = False, batch_size = 100):
+        super(BatchingFileHandler, self).__init__(filename, mode, encoding, delay)
+        self._init_batching(batch_size)
+
+
+# -----------------------------------------------------------------------------
+# QueueLogListener
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class QueueLogListener(object):
+    """Emits the records of a queue through `handlers` on a background thread
+
+    The queue is drained record by record, and the handlers are flushed each
+    time it runs empty, so batching handlers write in bursts while records
+    keep coming and never hold records back when the queue is idle. With
+    `close_handlers` the handlers are closed by stop().
+    """
+
+    _STOP = object()
+
+    def __init__(self, queue, handlers, close_handlers = False):
+        self.queue = queue
+        self.handlers = list(handlers)
+        self.close_handlers = close_handlers
+        self.handler = None
+        self.logger = None
+        self._thread = None
+
+    @property
+    def dropped(self):
+        return self.handler.dropped if self.handler is not None else 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target = self._run, name = "QueueLogListener")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self, timeout = None):
+        """Detaches from the logger, emits the records still queued and stops the thread"""
+        if self.logger is not None and self.handler is not None:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
+        if self._thread is not None:
+            self.queue.put(self._STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        if self.close_handlers:
+            for handler in self.handlers:
+                handler.close()
+
+    def handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+    def _run(self):
+        # imported here to keep it out of the import time of sutils
+        from queue import Empty
+        queue = self.queue
+        while True:
+            record = queue.get()
+            while record is not self._STOP:
+                try:
+                    self.handle(record)
+                except Exception:
+                    pass
+                try:
+                    record = queue.get_nowait()
+                except Empty:
+                    break
+            self.flush()
+            if record is self._STOP:
+                return
+
+
+# -----------------------------------------------------------------------------
+# setup_queue_logging
+# -----------------------------------------------------------------------------
+
+@__all__.register
+def setup_queue_logging(logger = None, level = logging.INFO, format = "full", stream = None, filename = None, handlers = None,
+        maxsize = 10000, policy = 'drop', timeout = None, batch_size = 100):
+    """Moves log I/O of `logger` (default: root) off the logging threads
+
+    Installs a BoundedQueueHandler on the logger, and starts a QueueLogListener
+    emitting the queued records through `handlers`. When no handlers are given,
+    a BatchingFileHandler is created for `filename`, or a BatchingStreamHandler
+    for `stream` (default: stderr), formatted by `format`, which is either the
+    name of a LOG_FORMATS preset, a format string or a logging.Formatter.
+    Returns the started listener, its stop() detaches and drains the queue,
+    and closes the handlers created here.
+    """
+    # imported here to keep it out of the import time of sutils
+    import queue
+    if logger is None or isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    owned = handlers is None
+    if owned:
+        if filename is not None:
+            handler = BatchingFileHandler(filename, batch_size = batch_size)
+        else:
+            handler = BatchingStreamHandler(stream or sys.stderr, batch_size = batch_size)
+        if not isinstance(format, logging.Formatter):
+            format = logging.Formatter(LOG_FORMATS.get(format, format))
+        handler.setFormatter(format)
+        handlers = [ handler ]
+    listener = QueueLogListener(queue.Queue(maxsize), handlers, close_handlers = owned)
+    listener.handler = BoundedQueueHandler(listener.queue, policy = policy, timeout = timeout)
+    listener.logger = logger
+    logger.addHandler(listener.handler)
+    if level is not None:
+        logger.setLevel(level)
+    return listener.start()
+
+
+
+# -----------------------------------------------------------------------------
+# JsonFormatter
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single line JSON object, using the active
+    sutils._json backend
+
+    `fields` is the name of a LOG_FIELDS preset or a list of LogRecord
+    attribute names, where "message" is the formatted message and "asctime"
+    the formatted creation time. The extractor of each field is looked up
+    once, when the formatter is created, and the object is rendered from a
+    per-thread dict that is reused for every record. Exception and stack info
+    are added as "exc_text" and "stack_info" when present. `static` fields
+    are added to every record.
+    """
+
+    def __init__(self, fields = "full", datefmt = None, static = None):
+        super(JsonFormatter, self).__init__(datefmt = datefmt)
+        # imported here to keep it out of the import time of sutils
+        from . import _json
+        self._dumps = functools.partial(_json.dumps, fast = True)
+        if isinstance(fields, str):
+            fields = LOG_FIELDS[fields]
+        self.fields = tuple(fields)
+        self.static = dict(static or {})
+        self._extractors = [ ( name, self._make_extractor(name) ) for name in self.fields ]
+        self._local = threading.local()
+
+    def _make_extractor(self, name):
+        if name == "message":
+            def message(record):
+                return record.getMessage()
+            return message
+        if name == "asctime":
+            return self._make_asctime()
+        def extract(record, name = name):
+            return getattr(record, name, None)
+        return extract
+
+    def _make_asctime(self):
+        # strftime has a resolution of seconds: its result is reused while
+        # records are created within the same second
+        cache = [ ( None, None ) ]
+        converter, datefmt = self.converter, self.datefmt or self.default_time_format
+        msec_format = None if self.datefmt else self.default_msec_format
+        def asctime(record):
+            second = int(record.created)
+            cached_second, text = cache[0]
+            if cached_second != second:
+                text = time.strftime(datefmt, converter(record.created))
+                cache[0] = ( second, text )
+            if msec_format:
+                text = msec_format % (text, record.msecs)
+            return text
+        return asctime
+
+    def format(self, record):
+        try:
+            data = self._local.data
+            data.clear()
+        except AttributeError:
+            data = self._local.data = {}
+        if self.static:
+            data.update(self.static)
+        for name, extract in self._extractors:
+            data[name] = extract(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_text"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return self._dumps(data)
+
+
+
+# -----------------------------------------------------------------------------
+# MethodStats
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class MethodStats(PrettyObject):
+    """Call count, total / min / max latency and latency histogram of a method
+
+    histogram[i] counts the calls faster than BUCKETS[i] seconds (and not
+    faster than BUCKETS[i-1]), the last item counts the slower ones.
+    """
+
+    __pretty_format__ = PrettyObject.__PRETTY_FORMATS__.minimal
+    __pretty_fields__ = [ 'name', 'count', 'total:.6f', 'min:.6f', 'max:.6f' ]
+
+    BUCKETS = ( 1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0 )
+
+    def __init__(self, name, channel):
+        self.name = name
+        self.channel = channel
+        self._buckets = self.BUCKETS
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.total = 0.0
+            self.min = float('inf')
+            self.max = 0.0
+            self.histogram = [ 0 ] * (len(self.BUCKETS) + 1)
+
+    def add(self, elapsed, _bisect = bisect.bisect_right):
+        # explicit acquire / release, it is about twice as fast as `with`
+        lock = self._lock
+        lock.acquire()
+        try:
+            self.count += 1
+            self.total += elapsed
+            if elapsed < self.min:
+                self.min = elapsed
+            if elapsed > self.max:
+                self.max = elapsed
+            self.histogram[_bisect(self._buckets, elapsed)] += 1
+        finally:
+            lock.release()
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self):
+        with self._lock:
+            return qdict(name = self.name, count = self.count, total = self.total, min = self.min if self.count else 0.0,
+                max = self.max, mean = self.mean, histogram = list(self.histogram))
+
+
+# -----------------------------------------------------------------------------
+# @instrumented
+# -----------------------------------------------------------------------------
+
+__all__.append("INSTRUMENTED")
+# "channel.method" -> MethodStats of every instrumented method
+INSTRUMENTED = qdict()
+
+INSTRUMENT_ENVIRONMENT_VARIABLE = 'SUTILS_INSTRUMENT'
+
+
+def _instrumentation_enabled():
+    return os.environ.get(INSTRUMENT_ENVIRONMENT_VARIABLE, '').lower() in ( '1', 'true', 'yes', 'on' )
+
+
+def _timed(func, stats, is_coroutine):
+    clock, add = time.perf_counter, stats.add
+    if is_coroutine:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                add(clock() - start)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(clock() - start)
+    return wrapper
+
+
+@__all__.register
+def instrumented(obj = None, enabled = None, methods = None):
+    """Times the methods of a class, see MethodStats
+
+    The stats of each method are registered in INSTRUMENTED under
+    ``<channel>.<method>``, the channel being the one @logged uses for the
+    class, and are available as ``cls.__instrumentation__``. Plain, static and
+    class methods defined on the class are wrapped, except dunder methods
+    other than __call__, or only the ones named in `methods`.
+
+    Instrumentation is enabled by `enabled`, or when it is None, by the
+    SUTILS_INSTRUMENT environment variable. When disabled, the class is
+    returned untouched, so it costs nothing.
+    """
+    def _instrumented(cls):
+        if not (_instrumentation_enabled() if enabled is None else enabled):
+            return cls
+        # imported here to keep it out of the import time of sutils
+        import inspect
+        channel = _channel_name(cls, root_channel = '')
+        registry = qdict()
+        for name, attr in list(cls.__dict__.items()):
+            if methods is not None:
+                if name not in methods:
+                    continue
+            elif name.startswith('__') and name.endswith('__') and name != '__call__':
+                continue
+            wrapper_type = type(attr) if isinstance(attr, (staticmethod, classmethod)) else None
+            func = attr.__func__ if wrapper_type else attr
+            if not inspect.isfunction(func):
+                continue
+            stats = registry[name] = INSTRUMENTED[channel + '.' + name] = MethodStats(name, channel)
+            timed = _timed(func, stats, inspect.iscoroutinefunction(func))
+            setattr(cls, name, wrapper_type(timed) if wrapper_type else timed)
+        cls.__instrumentation__ = registry
+        return cls
+    if obj is not None:
+        return _instrumented(obj)
+    return _instrumented
+
+
+@__all__.register
+def report_instrumentation(level = logging.INFO, reset = False):
+    """Logs the stats of every called instrumented method through the channel of its class"""
+    for stats in list(INSTRUMENTED.values()):
+        data = stats.as_dict()
+        if not data.count:
+            continue
+        logging.getLogger(stats.channel).log(level, "%s: count=%d total=%.6fs mean=%.6fs min=%.6fs max=%.6fs histogram=%s",
+            data.name, data.count, data.total, data.mean, data.min, data.max, data.histogram)
+        if reset:
+            stats.reset()
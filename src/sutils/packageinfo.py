@@ -25,8 +25,12 @@
 # -----------------------------------------------------------------------------
 
 import os
+import tempfile
+import threading
 import yaml
-from .primitives import qdict, qlist
+from .primitives import qdict, qlist, deeplayeredqdict
+from .logging_utils import logged
+from . import _binary
 
 
 # -----------------------------------------------------------------------------
@@ -36,6 +40,108 @@ from .primitives import qdict, qlist
 __all__ = qlist()
 
 
+# -----------------------------------------------------------------------------
+# configuration
+# -----------------------------------------------------------------------------
+
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# ( path, variant ) -> ( file stamp, pickled tree )
+_cache = {}
+
+
+# -----------------------------------------------------------------------------
+# _merge_package_info
+# -----------------------------------------------------------------------------
+
+def _read_package_yaml(path):
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader = _YamlLoader) or {}
+
+
+def _merge_package_info(path, tier = None):
+    info = _read_package_yaml(path)
+    tier = tier or info.get('tier', 'dev')
+    tier_info = info.pop("tiers", None)
+    res = qdict()
+    res.update(info, recursive = True, add_keys = True, convert_to_qdict = True)
+    if tier_info and tier_info.get(tier,None):
+        res.update(tier_info[tier], recursive = True, add_keys = True, convert_to_qdict = True)
+    return res
+
+
+# -----------------------------------------------------------------------------
+# _compile_package_layers
+# -----------------------------------------------------------------------------
+
+def _compile_package_layers(path):
+    """Converts the base info and every tier to qdict trees, to be stacked with deeplayeredqdict"""
+    info = _read_package_yaml(path)
+    tier_info = info.pop("tiers", None) or {}
+    tiers = qdict()
+    for name, tier in tier_info.items():
+        tiers[name] = qdict().update(tier or {}, recursive = True, add_keys = True, convert_to_qdict = True)
+    return qdict(
+        base = qdict().update(info, recursive = True, add_keys = True, convert_to_qdict = True),
+        tiers = tiers,
+    )
+
+
+# -----------------------------------------------------------------------------
+# _load_snapshot
+# -----------------------------------------------------------------------------
+
+def _snapshot_path(path, variant):
+    home, name = os.path.split(path)
+    return os.path.join(home, '.' + name + ('.' + variant if variant else '') + '.snapshot')
+
+
+def _load_snapshot(path, variant, build):
+    """Returns `build()` for the yaml at `path`, calling it only when the yaml changed.
+
+    The result is kept pickled in memory and in a snapshot file next to the
+    yaml, keyed on the path, the variant and the modification time, size and
+    inode of the yaml. Every call returns a fresh copy of the tree. The stamp
+    of a snapshot file can be forged, so it is read with _binary.safe_load(),
+    which only accepts plain data trees, and rebuilt when it is refused.
+    """
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    key = (os.path.abspath(path), variant)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return _binary.loads(cached[1])
+    snapshot_path = _snapshot_path(path, variant)
+    try:
+        with open(snapshot_path, 'rb') as f:
+            cached = _binary.safe_load(f)
+        if cached[0] == stamp:
+            tree = _binary.safe_loads(cached[1])
+            _cache[key] = cached
+            return tree
+    except Exception:
+        # missing, stale format, corrupt or forged snapshot
+        pass
+    tree = build()
+    cached = _cache[key] = (stamp, _binary.dumps(tree))
+    try:
+        fd, tmp = tempfile.mkstemp(dir = os.path.dirname(snapshot_path) or '.')
+        with os.fdopen(fd, 'wb') as f:
+            _binary.dump(cached, f)
+        os.replace(tmp, snapshot_path)
+    except OSError:
+        pass
+    return tree
+
+
+def _load_package_info(path, tier = None):
+    return _load_snapshot(path, 'tier.' + tier if tier else '', lambda: _merge_package_info(path, tier))
+
+
+def _load_package_layers(path):
+    return _load_snapshot(path, 'layers', lambda: _compile_package_layers(path))
+
+
 # -----------------------------------------------------------------------------
 # PackageInfo
 # -----------------------------------------------------------------------------
@@ -43,22 +149,141 @@ __all__ = qlist()
 @__all__.register
 class PackageInfo(qdict):
 
-    def __init__(self, package_home, name = None, description = None, version = None, package_info_path = None, debug = True ):
+    def __init__(self, package_home, name = None, description = None, version = None, package_info_path = None, debug = True, tier = None, cache = True ):
         self.package_home = package_home
         self.name = name
         self.description = description
         self.version = version
         self.debug = debug
         self.package_info_path = package_info_path or os.path.join(self.package_home, 'package.yaml')
+        self._defaults = qdict(self)
+        self._cache = cache
+        self._layers = None
+        self._tier_views = {}
         if (os.path.isfile(self.package_info_path)):
-            self.load_package_info()
+            self.load_package_info(tier = tier, cache = cache)
 
-    def load_package_info(self, path = None):
+    def load_package_info(self, path = None, tier = None, cache = True):
+        """Merges the package yaml into self, using the tier named by `tier` or by the yaml's `tier` key (default: dev)"""
         path = path or self.package_info_path
-        info = yaml.load(open(path, 'r').read())
-        tier = info.get('tier', 'dev')
-        tier_info = info.pop("tiers", None)
+        info = _load_package_info(path, tier) if cache else _merge_package_info(path, tier)
         self.update(info, recursive = True, add_keys = True, convert_to_qdict = True)
-        if tier_info and tier_info.get(tier,None):
-            self.update(tier_info[tier], recursive = True, add_keys = True, convert_to_qdict = True)
 
+    def _get_layers(self):
+        if self._layers is None:
+            if not os.path.isfile(self.package_info_path):
+                self._layers = qdict(base = qdict(), tiers = qdict())
+            elif self._cache:
+                self._layers = _load_package_layers(self.package_info_path)
+            else:
+                self._layers = _compile_package_layers(self.package_info_path)
+        return self._layers
+
+    def tier_names(self):
+        return list(self._get_layers().tiers)
+
+    def tier_view(self, tier):
+        """Returns the package info as it would be with `tier` selected, without re-merging.
+
+        Every tier is compiled once into an overlay layer, and the view stacks it
+        on the shared base, so views of several tiers can be held at the same
+        time and cost no copying. Views are meant for reading: writes to nested
+        sections would go into the shared layers.
+        """
+        try:
+            return self._tier_views[tier]
+        except KeyError:
+            pass
+        layers = self._get_layers()
+        maps = [ layers.base, self._defaults ]
+        if layers.tiers.get(tier):
+            maps.insert(0, layers.tiers[tier])
+        view = self._tier_views[tier] = deeplayeredqdict({}, *maps)
+        return view
+
+
+# -----------------------------------------------------------------------------
+# PackageInfoWatcher
+# -----------------------------------------------------------------------------
+
+@__all__.register
+@logged
+class PackageInfoWatcher(object):
+    """Keeps a PackageInfo up to date with its yaml file.
+
+    A background thread polls the yaml every `interval` seconds. When the file
+    changes, a complete new PackageInfo is built and then published by
+    rebinding `current`, which is a single atomic reference assignment. Readers
+    never see a half merged tree and never take a lock. To get consistent
+    values across several reads, take the tree once::
+
+        watcher = PackageInfoWatcher(package_home).start()
+        info = watcher.current      # stays unchanged while in use
+        connect(info.db.host, info.db.port)
+
+    Attribute access on the watcher itself is forwarded to `current`. If the
+    yaml fails to load (e.g. while it is being edited), the previous tree stays
+    current and the error is logged.
+    """
+
+    def __init__(self, package_home, interval = 1.0, on_change = None, **kwargs):
+        self.package_home = package_home
+        self.interval = interval
+        self.on_change = on_change
+        self.kwargs = kwargs
+        self.current = PackageInfo(package_home, **kwargs)
+        self._stamp = self._get_stamp()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __getattr__(self, key):
+        if key == 'current' or key.startswith('_'):
+            raise AttributeError(key)
+        return getattr(self.current, key)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _get_stamp(self):
+        try:
+            st = os.stat(self.current.package_info_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def check(self):
+        """Reloads the package info if the yaml changed, returns True when a new tree was published"""
+        stamp = self._get_stamp()
+        if stamp == self._stamp:
+            return False
+        try:
+            info = PackageInfo(self.package_home, **self.kwargs)
+        except Exception:
+            self.__logger.exception("failed to reload %s", self.current.package_info_path)
+            return False
+        self._stamp = stamp
+        self.current = info
+        if self.on_change:
+            self.on_change(info)
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target = self._run, name = "PackageInfoWatcher")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self, timeout = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# project: sutils
+# description: Smart Utilities
+# file: sutils/shared_utils.py
+# file-version: 3.1
+# author: DANA <dkovacs@deasys.eu>
+# license: GPL 3.0
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# -----------------------------------------------------------------------------
+# imports
+# -----------------------------------------------------------------------------
+
+import io
+import os
+import mmap
+import pickle
+import struct
+import tempfile
+
+from collections.abc import Mapping
+from multiprocessing import shared_memory
+
+from .primitives import qlist, qdict
+
+
+# -----------------------------------------------------------------------------
+# exports
+# -----------------------------------------------------------------------------
+
+__all__ = qlist()
+
+
+# -----------------------------------------------------------------------------
+# layout
+# -----------------------------------------------------------------------------
+# header: magic, offset and size of the root index
+# every dict is stored as a pickled index { key: ( is_dict, offset, size ) },
+# every other value is pickled on its own
+
+_HEADER = struct.Struct('<4sQQ')
+_MAGIC = b'SQD1'
+
+
+def _encode(data):
+    out = io.BytesIO()
+    out.write(b'\0' * _HEADER.size)
+    def write(blob):
+        offset = out.tell()
+        out.write(blob)
+        return offset, len(blob)
+    def encode_dict(node):
+        index = {}
+        for key, value in node.items():
+            if isinstance(value, dict):
+                index[key] = (True,) + encode_dict(value)
+            else:
+                index[key] = (False,) + write(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        return write(pickle.dumps(index, pickle.HIGHEST_PROTOCOL))
+    offset, size = encode_dict(data)
+    out.seek(0)
+    out.write(_HEADER.pack(_MAGIC, offset, size))
+    return out.getvalue()
+
+
+def _root(buffer):
+    magic, offset, size = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError('not a sharedqdict buffer')
+    return sharedqdict(buffer, offset, size)
+
+
+# -----------------------------------------------------------------------------
+# sharedqdict
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class sharedqdict(Mapping):
+    """Read-only qdict view over a buffer shared between processes
+
+    Nested dicts are views over the same buffer. Other values are unpickled
+    from the buffer on first access and memoized in the accessing process, so
+    each process only materializes the parts of the tree it actually reads.
+    Use SharedQdictStore to create or attach to a buffer.
+
+    Usage::
+
+        >>> store = SharedQdictStore.create( qdict( db = qdict( host = 'localhost' ) ) )
+        >>> store.root.db.host                                      # in the parent
+        'localhost'
+        >>> SharedQdictStore.attach( store.name ).root.db.host      # in a worker
+        'localhost'
+
+    """
+
+    __slots__ = ( '_buffer', '_index', '_cache' )
+
+    def __init__(self, buffer, offset, size):
+        object.__setattr__(self, '_buffer', buffer)
+        object.__setattr__(self, '_index', pickle.loads(buffer[offset:offset + size]))
+        object.__setattr__(self, '_cache', {})
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        is_dict, offset, size = self._index[key]
+        if is_dict:
+            value = sharedqdict(self._buffer, offset, size)
+        else:
+            value = pickle.loads(self._buffer[offset:offset + size])
+        self._cache[key] = value
+        return value
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        raise TypeError('sharedqdict is read only')
+
+    __delattr__ = __setattr__
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return 'sharedqdict(' + repr(dict(self.items())) + ')'
+
+    def to_qdict(self):
+        """Copies the view into a regular qdict tree"""
+        return qdict((k, v.to_qdict() if isinstance(v, sharedqdict) else v) for k, v in self.items())
+
+
+# -----------------------------------------------------------------------------
+# SharedQdictStore
+# -----------------------------------------------------------------------------
+
+@__all__.register
+class SharedQdictStore(object):
+    """Owns the shared memory segment or memory mapped file behind a sharedqdict tree
+
+    The creator calls close() and unlink() when done; attached processes only
+    call close(). Views obtained from root must not be used after close().
+    """
+
+    def __init__(self, buffer, closer, name = None):
+        self.name = name
+        self.root = _root(buffer)
+        self._buffer = buffer
+        self._closer = closer
+        self._shm = None
+
+    @classmethod
+    def create(cls, data, name = None):
+        """Copies data into a new shared memory segment"""
+        blob = _encode(data)
+        shm = shared_memory.SharedMemory(name = name, create = True, size = len(blob))
+        shm.buf[:len(blob)] = blob
+        res = cls(shm.buf, shm.close, shm.name)
+        res._shm = shm
+        return res
+
+    @classmethod
+    def attach(cls, name):
+        """Attaches to a segment created by create() in another process"""
+        try:
+            shm = shared_memory.SharedMemory(name = name, track = False)
+        except TypeError:
+            # python < 3.13 registers attached segments with the resource tracker of the
+            # attaching process, which unlinks them when that process exits. On linux the
+            # segment is mapped from /dev/shm instead, elsewhere the creator has to outlive
+            # the workers started outside of multiprocessing.
+            path = os.path.join('/dev/shm', name.lstrip('/'))
+            if os.path.exists(path):
+                res = cls.open_file(path)
+                res.name = name
+                return res
+            shm = shared_memory.SharedMemory(name = name)
+        return cls(shm.buf, shm.close, shm.name)
+
+    @staticmethod
+    def write_file(data, path):
+        """Writes data to a file that can be mapped with open_file()"""
+        blob = _encode(data)
+        fd, tmp = tempfile.mkstemp(dir = os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, path)
+
+    @classmethod
+    def open_file(cls, path):
+        """Maps a file written by write_file(), pages are shared through the page cache"""
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        buffer = memoryview(mapping)
+        def closer():
+            buffer.release()
+            mapping.close()
+        return cls(buffer, closer, path)
+
+    def close(self):
+        self.root = None
+        self._buffer = None
+        self._closer()
+
+    def unlink(self):
+        if self._shm is None:
+            raise TypeError('only the creator of a shared memory segment can unlink it')
+        self._shm.unlink()
@@ -24,6 +24,12 @@
 # imports
 # -----------------------------------------------------------------------------
 
+import os
+import io
+import codecs
+import selectors
+import threading
+from collections import deque
 from threading import Thread
 from queue import Queue, Empty
 
@@ -32,7 +38,7 @@ from queue import Queue, Empty
 # exports
 # -----------------------------------------------------------------------------
 
-from .primitivies import qlist
+from .primitives import qlist
 __all__ = qlist()
 
 
@@ -84,3 +90,387 @@ class NonBlockingStreamReader(object):
         except Empty:
             return None
 
+
+
+# ---------------------------------------------------
+# _LineSplitter
+# ---------------------------------------------------
+
+class _LineSplitter(object):
+    """Splits the data read from a stream's file descriptor into lines
+
+    Text streams give str lines (with universal newlines, like the text mode
+    of subprocess), binary streams give bytes lines. At the end of the stream
+    the last, unterminated line is returned too.
+    """
+
+    def __init__(self, stream):
+        if isinstance(stream, io.TextIOBase):
+            decoder = codecs.getincrementaldecoder(stream.encoding or 'utf-8')(getattr(stream, 'errors', None) or 'strict')
+            self._decoder = io.IncrementalNewlineDecoder(decoder, translate = True)
+            self._newline = '\n'
+        else:
+            self._decoder = None
+            self._newline = b'\n'
+        self._partial = self._newline[:0]
+
+    def feed(self, data):
+        """Returns the lines completed by `data`, b'' means the end of the stream"""
+        eof = not data
+        if self._decoder is not None:
+            data = self._decoder.decode(data, final = eof)
+        lines = (self._partial + data).split(self._newline)
+        self._partial = lines.pop()
+        newline = self._newline
+        lines = [ line + newline for line in lines ]
+        if eof and self._partial:
+            lines.append(self._partial)
+            self._partial = self._partial[:0]
+        return lines
+
+
+# ---------------------------------------------------
+# StreamMultiplexer
+# ---------------------------------------------------
+
+@__all__.register
+class StreamMultiplexer(object):
+    """Reads any number of streams on a single thread, using selectors
+
+    Each stream is read through a MultiplexedStreamReader, which has the same
+    readline(timeout) interface as NonBlockingStreamReader. The selector is
+    only touched by the multiplexer's thread, other threads pass it commands
+    and wake it up through a self-pipe.
+    """
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self._commands = deque()
+        # guards _closed and the wakeup pipe, which the thread closes on exit
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = Thread(target = self._run, name = "StreamMultiplexer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def reader(self, stream, max_lines = 10000):
+        return MultiplexedStreamReader(stream, max_lines = max_lines, multiplexer = self)
+
+    def close(self, timeout = None):
+        """Stops the thread. Readers keep the lines read so far."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._send(None)
+        self._thread.join(timeout)
+
+    def _call(self, command, *args):
+        # once closed the pipe may be closed too, and its fd number reused
+        with self._lock:
+            if not self._closed:
+                self._send(command, *args)
+
+    def _send(self, command, *args):
+        self._commands.append((command, args))
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            # the pipe is full of wakeups already
+            pass
+
+    def _run(self):
+        try:
+            while True:
+                for key, _ in self._selector.select():
+                    if key.data is None:
+                        try:
+                            while os.read(self._wakeup_r, 4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        while self._commands:
+                            command, args = self._commands.popleft()
+                            if command is None:
+                                return
+                            command(*args)
+                    else:
+                        # a failing stream must not stop the others
+                        try:
+                            key.data._on_readable()
+                        except Exception as exc:
+                            key.data._fail(exc)
+        finally:
+            with self._lock:
+                self._closed = True
+                self._selector.close()
+                os.close(self._wakeup_r)
+                os.close(self._wakeup_w)
+
+    def _register(self, reader):
+        if not reader._eof and not reader._closed:
+            try:
+                self._selector.register(reader._fd, selectors.EVENT_READ, reader)
+            except KeyError:
+                # registered already
+                pass
+            except (OSError, ValueError) as exc:
+                # e.g. the stream was closed in the meantime
+                reader._fail(exc)
+
+    def _unregister(self, reader):
+        try:
+            self._selector.unregister(reader._fd)
+        except (KeyError, ValueError):
+            pass
+
+
+_default_multiplexer = None
+_default_multiplexer_lock = threading.Lock()
+
+
+def _get_default_multiplexer():
+    global _default_multiplexer
+    with _default_multiplexer_lock:
+        if _default_multiplexer is None or _default_multiplexer._closed or not _default_multiplexer._thread.is_alive():
+            _default_multiplexer = StreamMultiplexer()
+        return _default_multiplexer
+
+
+# ---------------------------------------------------
+# MultiplexedStreamReader
+# ---------------------------------------------------
+
+@__all__.register
+class MultiplexedStreamReader(object):
+    """Drop-in replacement of NonBlockingStreamReader without a thread per stream
+
+    stream: the stream to read from, usually a process' stdout or stderr.
+            Text streams give str lines (with universal newlines, like the
+            text mode of subprocess), binary streams give bytes lines. Its
+            file descriptor is read directly and is switched to non-blocking,
+            so the stream object itself should not be read any more.
+    max_lines: once this many lines are waiting, the stream is not read
+            until half of them are consumed, so the writer blocks on the
+            full pipe instead of the lines piling up in memory.
+    multiplexer: the StreamMultiplexer to use, by default a shared one.
+
+    If reading or decoding the stream fails (e.g. invalid utf-8 on a text
+    stream), the exception is kept in `error` and the reader ends as if the
+    stream ended.
+    """
+
+    def __init__(self, stream, max_lines = 10000, multiplexer = None):
+        self._s = stream
+        self._fd = stream.fileno()
+        os.set_blocking(self._fd, False)
+        self._splitter = _LineSplitter(stream)
+        self._lines = deque()
+        self._max_lines = max_lines
+        self._paused = False
+        self._eof = False
+        self._closed = False
+        self.error = None
+        self._cond = threading.Condition(threading.Lock())
+        self._mux = multiplexer or _get_default_multiplexer()
+        self._mux._call(self._mux._register, self)
+
+    @property
+    def eof(self):
+        """True when the stream ended and all of its lines were read"""
+        return self._eof and not self._lines
+
+    def readline(self, timeout = None):
+        """Returns the next line, or None when there is none within `timeout` seconds (None: don't wait)"""
+        with self._cond:
+            if not self._lines and timeout is not None and not self._eof:
+                self._cond.wait_for(lambda: self._lines or self._eof, timeout)
+            if not self._lines:
+                return None
+            line = self._lines.popleft()
+            if self._paused and len(self._lines) <= self._max_lines // 2:
+                self._paused = False
+                self._mux._call(self._mux._register, self)
+            return line
+
+    def close(self):
+        """Stops reading the stream"""
+        self._closed = True
+        self._mux._call(self._mux._unregister, self)
+
+    def _on_readable(self):
+        # runs on the multiplexer's thread
+        try:
+            data = os.read(self._fd, self._mux.CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        lines = self._splitter.feed(data)
+        with self._cond:
+            self._lines.extend(lines)
+            if not data:
+                self._eof = True
+                self._mux._unregister(self)
+            elif len(self._lines) >= self._max_lines:
+                self._paused = True
+                self._mux._unregister(self)
+            self._cond.notify_all()
+
+    def _fail(self, exc):
+        # runs on the multiplexer's thread: the stream is not read any more,
+        # the lines read so far can still be consumed
+        self._mux._unregister(self)
+        with self._cond:
+            self.error = exc
+            self._eof = True
+            self._cond.notify_all()
+
+
+
+# ---------------------------------------------------
+# AsyncStreamReader
+# ---------------------------------------------------
+
+class _AsyncLineProtocol(object):
+    """asyncio read pipe protocol feeding an AsyncStreamReader"""
+
+    def __init__(self, reader):
+        self._reader = reader
+
+    def connection_made(self, transport):
+        self._reader._transport = transport
+
+    def data_received(self, data):
+        self._reader._feed(data)
+
+    def eof_received(self):
+        self._reader._feed(b'')
+
+    def connection_lost(self, exc):
+        self._reader._feed(b'')
+
+
+@__all__.register
+class AsyncStreamReader(object):
+    """asyncio counterpart of NonBlockingStreamReader, reading on the event loop without threads
+
+        reader = AsyncStreamReader(proc.stdout)
+        async for line in reader:
+            ...
+
+    stream: the stream to read from, usually the stdout or stderr pipe of a
+            subprocess.Popen. Text streams give str lines (with universal
+            newlines), binary streams give bytes lines. The reader takes the
+            stream over: it is connected to the running loop on first use and
+            closed at its end.
+    max_lines: once this many lines are waiting, reading is paused until
+            half of them are consumed.
+
+    If decoding the stream fails, the exception is kept in `error` and the
+    reader ends as if the stream ended.
+    """
+
+    def __init__(self, stream, max_lines = 10000):
+        self._s = stream
+        self._splitter = _LineSplitter(stream)
+        self._lines = deque()
+        self._max_lines = max_lines
+        self._paused = False
+        self._eof = False
+        self._transport = None
+        self._connected = False
+        self._waiters = []
+        self.error = None
+
+    @property
+    def eof(self):
+        """True when the stream ended and all of its lines were read"""
+        return self._eof and not self._lines
+
+    async def _wait(self, timeout):
+        # imported here to keep it out of the import time of sutils
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if not self._connected:
+            self._connected = True
+            await loop.connect_read_pipe(lambda: _AsyncLineProtocol(self), self._s)
+        if self._lines or self._eof:
+            return
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _pop(self):
+        line = self._lines.popleft()
+        if self._paused and len(self._lines) <= self._max_lines // 2:
+            self._paused = False
+            self._transport.resume_reading()
+        return line
+
+    async def readline(self, timeout = None):
+        """Returns the next line, or None at the end of the stream or after `timeout` seconds (None: no limit)"""
+        if not self._lines:
+            await self._wait(timeout)
+            if not self._lines:
+                return None
+        return self._pop()
+
+    async def read_lines(self, max_n = None, timeout = None):
+        """Waits for a line at most `timeout` seconds (None: no limit), and returns
+        it with the lines already waiting behind it, `max_n` lines at most.
+        Returns an empty list at the end of the stream or on timeout.
+        """
+        if not self._lines:
+            await self._wait(timeout)
+        count = len(self._lines) if max_n is None else min(max_n, len(self._lines))
+        return [ self._pop() for _ in range(count) ]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if line is None:
+            raise StopAsyncIteration
+        return line
+
+    def close(self):
+        """Stops reading and closes the stream"""
+        if self._transport is not None:
+            self._transport.close()
+        else:
+            self._s.close()
+        self._feed(b'')
+
+    def _feed(self, data):
+        if self._eof:
+            return
+        try:
+            self._lines.extend(self._splitter.feed(data))
+        except Exception as exc:
+            self.error = exc
+            data = b''
+            if self._transport is not None:
+                self._transport.close()
+        if not data:
+            self._eof = True
+        elif len(self._lines) >= self._max_lines and not self._paused:
+            self._paused = True
+            self._transport.pause_reading()
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        del self._waiters[:]
@@ -0,0 +1,92 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: binary_test.py
+# purpose: sutils._binary tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import array
+import pickle
+import datetime
+import pytest
+
+from sutils.primitives import qdict, qlist, fastqdict, NA, SmartEnum
+from sutils import _binary
+
+
+# ---------------------------------------------------------------------------------------
+# fixtures
+# ---------------------------------------------------------------------------------------
+
+class Color(SmartEnum):
+    red = 'r'
+
+@pytest.fixture
+def tree():
+    return qdict(
+        a = qlist([ qdict(b = NA, c = Color.red) ]),
+        d = fastqdict(e = 1),
+        blob = b'x' * 100,
+        big = b'y' * 100000,
+        mutable = qlist([ bytearray(b'z' * 100000) ]),
+        numbers = array.array('d', range(10000)),
+    )
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_roundtrip
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_roundtrip(tree):
+    res = _binary.loads(_binary.dumps(tree))
+    assert res == tree
+    assert type(res) is qdict and type(res.a) is qlist and type(res.d) is fastqdict
+    assert res.a[0].b is NA and res.a[0].c is Color.red
+    res.d.f = 2
+    assert res.d['f'] == 2
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_out_of_band
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_out_of_band(tree):
+    buffers = []
+    data = _binary.dumps(tree, buffer_callback = buffers.append)
+    assert len(buffers) == 3
+    assert len(data) < 10000
+    res = _binary.loads(data, buffers = buffers)
+    assert res == tree
+    assert type(res.big) is bytes and type(res.mutable[0]) is bytearray and type(res.numbers) is array.array
+    assert type(res.d) is fastqdict
+    # the objects behind the buffers are returned as they are, not copied
+    assert res.mutable[0] is tree.mutable[0] and res.big is tree.big and res.numbers is tree.numbers
+    # buffers received from elsewhere: a bytearray is used as is, bytes and arrays are copied
+    received = [ bytearray(buffer.raw()) for buffer in buffers ]
+    res = _binary.loads(data, buffers = received)
+    assert res == tree
+    assert any(res.mutable[0] is buffer for buffer in received)
+    assert type(res.big) is bytes and type(res.numbers) is array.array
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_safe_loads
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+EXECUTED = []
+
+class Exploit(object):
+    def __reduce__(self):
+        return (EXECUTED.append, (1,))
+
+def test_safe_loads(tree):
+    data = qdict(a = qlist([ 1, { 2.5, 'x' } ]), when = datetime.datetime(2020, 1, 2, tzinfo = datetime.timezone.utc), blob = b'x')
+    assert _binary.safe_loads(_binary.dumps(data)) == data
+    for obj in ( Exploit(), tree, Color.red ):
+        with pytest.raises(pickle.UnpicklingError):
+            _binary.safe_loads(_binary.dumps(obj))
+    assert EXECUTED == []
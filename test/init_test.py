@@ -0,0 +1,67 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: init_test.py
+# purpose: sutils package level (lazy) exports tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import os
+import sys
+import subprocess
+import importlib
+import pytest
+
+import sutils
+
+
+# ---------------------------------------------------------------------------------------
+# helpers
+# ---------------------------------------------------------------------------------------
+
+def _run(code):
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(sys.path))
+    return subprocess.check_output([ sys.executable, "-c", code ], env = env, universal_newlines = True).strip()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_exports_table_matches_submodules
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize("module", sorted(sutils._EXPORTS))
+def test_exports_table_matches_submodules(module):
+    submodule = importlib.import_module("sutils." + module)
+    assert list(sutils._EXPORTS[module]) == list(submodule.__all__)
+    for name in sutils._EXPORTS[module]:
+        assert getattr(sutils, name) is getattr(submodule, name)
+
+
+def test_submodules_table():
+    package_dir = os.path.dirname(sutils.__file__)
+    modules = sorted(name[:-3] for name in os.listdir(package_dir) if name.endswith(".py") and name != "__init__.py")
+    assert sorted(sutils._SUBMODULES) == modules
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_lazy_import
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_lazy_import():
+    loaded = _run("import sys, sutils; print(sorted(m for m in sys.modules if m.startswith('sutils.') or m in ('logging', 'yaml')))")
+    assert loaded == "[]"
+    loaded = _run("import sys; from sutils import qdict; print(sorted(m for m in sys.modules if m.startswith('sutils.')))")
+    assert loaded == "['sutils.primitives']"
+    assert _run("import sutils; print(sutils.packageinfo.__name__)") == "sutils.packageinfo"
+    with pytest.raises(AttributeError):
+        sutils.no_such_name
+
+
+def test_star_import():
+    names = _run("from sutils import *; print(sorted(n for n in dir() if not n.startswith('_')))")
+    assert names == str(sorted(sutils.__all__))
+    # as before the lazy exports, the submodules come with the star import
+    for module in ( 'primitives', 'logging_utils', 'string_utils', 'meta_patterns' ):
+        assert module in sutils.__all__
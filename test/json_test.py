@@ -0,0 +1,277 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: json_test.py
+# purpose: sutils._json tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import io
+import json
+import uuid
+import decimal
+import datetime
+import collections
+import pytest
+
+from sutils.primitives import qdict, qlist, lazyqdict, layeredqdict, deeplayeredqdict, NA, SmartEnum, PrettyObject
+from sutils import _json
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_loads
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_loads():
+    d = _json.loads('{"a": {"b": [{"c": 1}]}}')
+    assert type(d) is qdict and type(d.a) is qdict and type(d.a.b[0]) is qdict
+    assert d.a.b[0].c == 1
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_loads_lazy
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_loads_lazy():
+    d = _json.load(io.StringIO('{"a": {"b": [{"c": 1}]}}'), lazy = True)
+    assert type(d) is lazyqdict
+    assert d.a.b[0].c == 1
+    assert _json.loads('[1, 2]', lazy = True) == [1, 2]
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_iterload
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize("chunk_size", [ 1, 3, 7, 65536 ])
+def test_iterload(chunk_size):
+    document = ' [ {"a": 12345, "b": "x, ]"}, 678901, [1, {"c": 2}],\n "é" ] '
+    expected = [ dict(a = 12345, b = "x, ]"), 678901, [ 1, dict(c = 2) ], "é" ]
+    items = list(_json.iterload(io.StringIO(document), chunk_size = chunk_size))
+    assert items == expected
+    assert type(items[0]) is qdict and type(items[2][1]) is qdict
+    assert list(_json.iterload(io.BytesIO(document.encode('utf-8')), chunk_size = chunk_size)) == expected
+    assert list(_json.iterload(io.StringIO('[]'), chunk_size = chunk_size)) == []
+    assert list(_json.iterload(io.StringIO('{"a": 1}'), chunk_size = chunk_size)) == [ dict(a = 1) ]
+    with pytest.raises(ValueError):
+        list(_json.iterload(io.StringIO('[1, 2'), chunk_size = chunk_size))
+    with pytest.raises(ValueError):
+        list(_json.iterload(io.StringIO('[1 2]'), chunk_size = chunk_size))
+    floats = [ i + 0.123456 for i in range(2000) ]
+    assert list(_json.iterload(io.StringIO(json.dumps(floats)), chunk_size = chunk_size)) == floats
+
+
+def test_iterload_number_cut_at_chunk_boundary():
+    document = '[1.5, 2e3, 12.5e-2, 7E+1, -0.25]'
+    expected = [ 1.5, 2e3, 12.5e-2, 7E+1, -0.25 ]
+    # every chunk size, so the window ends right after each '.' and 'e' once
+    for chunk_size in range(1, len(document) + 1):
+        assert list(_json.iterload(io.StringIO(document), chunk_size = chunk_size)) == expected
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_iterload_values_cut_at_chunk_boundary
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_iterload_values_cut_at_chunk_boundary():
+    expected = [ "a long string \u00e9 with \"escapes\"", True, None, float("-inf"), { "a": [ 1, { "b": "c" } ] }, [] ]
+    document = json.dumps(expected)
+    for chunk_size in range(1, len(document) + 1):
+        assert list(_json.iterload(io.StringIO(document), chunk_size = chunk_size)) == expected
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_iterload_malformed_element
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class CountingReader(io.StringIO):
+
+    def read(self, size = -1):
+        data = super(CountingReader, self).read(size)
+        self.total = getattr(self, 'total', 0) + len(data)
+        return data
+
+def test_iterload_malformed_element():
+    for bad in ( '{"a" 1}', '[1 2]', 'nul', '"a\nb"' ):
+        document = '[1, %s, %s]' % (bad, ', '.join([ '{"id": 1}' ] * 100000))
+        fp = CountingReader(document)
+        with pytest.raises(json.JSONDecodeError):
+            list(_json.iterload(fp, chunk_size = 1024))
+        assert fp.total <= 1024
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_load_lines
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_load_lines():
+    lines = _json.load_lines(io.BytesIO(b'{"a": 1}\n\n{"b": {"c": 2}}\n'))
+    assert lines == [ dict(a = 1), dict(b = dict(c = 2)) ]
+    assert type(lines[1].b) is qdict
+    assert [ type(i) for i in _json.iterload_lines(io.StringIO('{"a": 1}'), lazy = True) ] == [ lazyqdict ]
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_loads_non_identifier_keys
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_loads_non_identifier_keys():
+    d = _json.loads('{"1": {"a-b": 2, "": 3, "self": 4}}')
+    assert d == { "1": { "a-b": 2, "": 3, "self": 4 } }
+    assert type(d["1"]) is qdict
+    assert _json.extended_decoder({ "a-b": 1 }) == { "a-b": 1 }
+    assert _json.loads('{"a": 1}', object_hook = dict) == { "a": 1 }
+
+
+# ---------------------------------------------------------------------------------------
+# backend
+# ---------------------------------------------------------------------------------------
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(_json, '_backend', None)
+    yield
+    monkeypatch.setattr(_json, '_backend', None)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_backends_produce_same_data
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_backends_produce_same_data(backend):
+    data = qdict(a = 1, b = [ qdict(c = "é", d = None) ], e = { 1: 2.5 }, f = 2 ** 70)
+    expected = _json.JsonBackend().dumps(data)
+    for name in list(_json.BACKENDS):
+        try:
+            _json.set_backend(name)
+        except ImportError:
+            continue
+        assert _json.loads(_json.dumps(data, fast = True)) == _json.loads(expected)
+        assert _json.dumps(data, fast = True, separators = (',', ':'), sort_keys = True) == _json.JsonBackend().dumps(data, separators = (',', ':'), sort_keys = True)
+        assert type(_json.loads('{"a": {}}', lazy = True).a) is lazyqdict
+        assert type(_json.loads('{"a": {}}', lazy = True, fast = True).a) is lazyqdict
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_loads_lazy_does_not_depend_on_backend
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_loads_lazy_does_not_depend_on_backend(backend):
+    big = 123456789012345678901234567890
+    for name in list(_json.BACKENDS):
+        try:
+            _json.set_backend(name)
+        except ImportError:
+            continue
+        d = _json.loads('{"a": NaN, "b": %d}' % big, lazy = True)
+        assert d.a != d.a and d.b == big and type(d.b) is int
+        assert _json.load(io.StringIO('[%d]' % big), lazy = True) == [ big ]
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_dumps_matches_stdlib
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+Pair = collections.namedtuple('Pair', 'a b')
+
+def test_dumps_matches_stdlib(backend):
+    key = uuid.UUID(int = 1)
+    cases = [ "é ü \u2603", Pair(1, "x"), [ Pair(1, 2) ], key, { "id": key }, float("nan"), [ 1.5, float("inf") ], qdict(a = [ 1, { "b": None } ]) ]
+    for name in list(_json.BACKENDS):
+        try:
+            _json.set_backend(name)
+        except ImportError:
+            continue
+        for case in cases:
+            expected = json.dumps(case, default = _json.extended_encoder)
+            assert _json.dumps(case) == expected
+            if "NaN" not in expected and "Infinity" not in expected:
+                assert json.loads(_json.dumps(case, fast = True)) == json.loads(expected)
+    assert json.loads(_json.dumps(Pair(1, 2))) == [ 1, 2 ]
+    assert json.loads(_json.dumps(key)) == str(key)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_backend_selection
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_backend_selection(backend, monkeypatch):
+    monkeypatch.setenv(_json.BACKEND_ENVIRONMENT_VARIABLE, 'json')
+    assert _json.get_backend().name == 'json'
+    def unavailable():
+        raise ImportError('not installed')
+    monkeypatch.setattr(_json, 'BACKENDS', qdict(_json.BACKENDS))
+    _json.register_backend('missing', unavailable)
+    assert list(_json.BACKENDS)[-1] == 'json'
+    assert _json.set_backend().name != 'missing'
+    with pytest.raises(ImportError):
+        _json.set_backend('missing')
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_dumps_extended_types
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class Color(SmartEnum):
+    red = 'r'
+
+class Point(PrettyObject):
+    __pretty_fields__ = [ 'x', 'y:02d' ]
+    def __init__(self):
+        self.x, self.y = 1, 2
+
+class Plain(object):
+    def __init__(self):
+        self.a = 1
+
+def test_dumps_extended_types(backend):
+    for name in list(_json.BACKENDS):
+        try:
+            _json.set_backend(name)
+        except ImportError:
+            continue
+        data = _json.loads(_json.dumps(dict(
+            when = datetime.datetime(2020, 1, 2, 3, 4, 5),
+            color = Color.red,
+            na = NA,
+            point = Point(),
+            plain = Plain(),
+            error = ValueError('boom'),
+        ), fast = True))
+        assert data.when == '2020-01-02T03:04:05'
+        assert data.color == 'r'
+        assert data.na is None
+        assert data.point == { '__class__': 'json_test.Point', 'x': 1, 'y': 2 }
+        assert data.plain == { '__class__': 'json_test.Plain', '__dict__': { 'a': 1 } }
+        assert data.error == { '__class__': 'builtins.ValueError', '__dict__': { 'message': 'boom' } }
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_register_encoder
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_register_encoder(monkeypatch):
+    monkeypatch.setattr(_json, 'ENCODERS', qlist(_json.ENCODERS))
+    monkeypatch.setattr(_json, '_encoders', {})
+    assert _json.extended_encoder(Plain()) == { '__class__': 'json_test.Plain', '__dict__': { 'a': 1 } }
+    _json.register_encoder(Plain, lambda cls: lambda obj: obj.a)
+    assert _json.extended_encoder(Plain()) == 1
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_dumps_mappings_and_unencodable_objects
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class Slotted(object):
+    __slots__ = ( 'a', )
+
+def test_dumps_mappings_and_unencodable_objects():
+    base = qdict(db = qdict(host = "localhost", port = 1))
+    assert json.loads(_json.dumps(layeredqdict(qdict(debug = True), base))) == { "debug": True, "db": { "host": "localhost", "port": 1 } }
+    assert json.loads(_json.dumps(deeplayeredqdict(qdict(db = qdict(port = 2)), base))) == { "db": { "host": "localhost", "port": 2 } }
+    for obj in ( decimal.Decimal("1.5"), Slotted() ):
+        with pytest.raises(TypeError):
+            _json.dumps(obj)
@@ -0,0 +1,263 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: logging_utils_test.py
+# purpose: sutils.logging_utils tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import io
+import os
+import json
+import asyncio
+import threading
+import queue
+import pickle
+import logging
+import pytest
+
+from sutils.primitives import PrettyObject
+from sutils.logging_utils import logged, lazyrepr, LazyLogRecord, enable_lazy_log_records
+from sutils.logging_utils import BoundedQueueHandler, BatchingFileHandler, setup_queue_logging, RateLimitFilter, JsonFormatter
+from sutils.logging_utils import instrumented, report_instrumentation, INSTRUMENTED
+
+
+# ---------------------------------------------------------------------------------------
+# fixtures
+# ---------------------------------------------------------------------------------------
+
+class Counted(PrettyObject):
+    __pretty_fields__ = [ 'x' ]
+    formatted = 0
+
+    def __init__(self, x):
+        self.x = x
+
+    def __repr__(self):
+        Counted.formatted += 1
+        return "<Counted x=%r>" % self.x
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self, level = logging.NOTSET):
+        super(ListHandler, self).__init__(level)
+        self.records = []
+        self.lines = []
+
+    def emit(self, record):
+        self.records.append(record)
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger("sutils.test.%d" % id(object()))
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    yield logger
+    logger.handlers[:] = []
+
+
+@pytest.fixture
+def lazy_records():
+    previous = enable_lazy_log_records()
+    yield
+    logging.setLogRecordFactory(previous)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_lazy_log_records
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_lazy_log_records(logger, lazy_records):
+    handlers = [ ListHandler(), ListHandler() ]
+    for handler in handlers:
+        logger.addHandler(handler)
+    Counted.formatted = 0
+    obj = Counted(1)
+    logger.debug("skipped %r", lazyrepr(obj))
+    assert Counted.formatted == 0
+    logger.info("value %s", lazyrepr(obj))
+    logger.info("again %r", obj)
+    assert Counted.formatted == 2
+    record = handlers[0].records[1]
+    assert type(record) is LazyLogRecord
+    assert handlers[0].lines == handlers[1].lines == [ "value <Counted x=1>", "again <Counted x=1>" ]
+    record.args = ( 2, )
+    assert record.getMessage() == "again 2"
+    assert "_message_cache" not in record.__dict__
+    assert record.__reduce_ex__(4)[2] == record.__dict__
+    copied = pickle.loads(pickle.dumps(record))
+    assert not hasattr(copied, "_message_cache") and copied.getMessage() == "again 2"
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_setup_queue_logging
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_setup_queue_logging(logger, tmp_path):
+    stream = io.StringIO()
+    listener = setup_queue_logging(logger, format = "%(levelname)s %(message)s", stream = stream, batch_size = 1000)
+    for i in range(500):
+        logger.info("line %d", i)
+    logger.debug("hidden")
+    listener.stop()
+    assert stream.getvalue().splitlines() == [ "INFO line %d" % i for i in range(500) ]
+    assert listener.dropped == 0 and listener.handler not in logger.handlers
+    path = str(tmp_path / "log.txt")
+    listener = setup_queue_logging(logger, filename = path)
+    logger.warning("to file")
+    listener.stop()
+    assert listener.handlers[0].stream is None
+    with open(path) as f:
+        assert f.read().endswith("\tWARNING\t[pid:%d tid:%x (MainThread)]\t%s:\tto file\n" % (os.getpid(), threading.get_ident(), logger.name))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_batching_file_handler_close
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_batching_file_handler_close(logger, tmp_path):
+    path = str(tmp_path / "log.txt")
+    handler = BatchingFileHandler(path, delay = True, batch_size = 100)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.warning("pending")
+    logger.removeHandler(handler)
+    handler.close()
+    with open(path) as f:
+        assert f.read() == "pending\n"
+
+
+def test_bounded_queue_handler_policies(logger):
+    for policy, timeout in (( 'drop', None ), ( 'block', 0.01 )):
+        handler = BoundedQueueHandler(queue.Queue(2), policy = policy, timeout = timeout)
+        logger.addHandler(handler)
+        for i in range(5):
+            logger.info("line %d", i)
+        logger.removeHandler(handler)
+        assert handler.dropped == 3 and handler.queue.qsize() == 2
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(), policy = 'spill')
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_rate_limit_filter
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_rate_limit_filter(logger):
+    now = [ 0.0 ]
+    handler = ListHandler()
+    logger.addHandler(handler)
+    limiter = RateLimitFilter(rate = 2, burst = 3, clock = lambda: now[0])
+    logger.addFilter(limiter)
+    for second in range(3):
+        for i in range(10):
+            logger.info("item %d", i)
+        now[0] += 1
+    logger.info("other site")
+    assert len(handler.lines) == 3 + 2 + 2 + 1
+    assert handler.lines[3] == "item 0 (7 similar records suppressed)"
+    assert handler.records[3].suppressed == 7
+    assert limiter.suppressed == 23 and list(limiter.summary().values()) == [ 23 ]
+
+
+def test_logged_options(logger):
+    samples = iter([ 0.05, 0.5, 0.2, 0.01 ])
+    @logged(sample = 0.1)
+    class Sampled(object):
+        def work(self):
+            for i in range(4):
+                self.__logger.warning("work %d", i)
+    limiter, = Sampled._Sampled__logger.filters
+    limiter._random = lambda: next(samples)
+    handler = ListHandler()
+    Sampled._Sampled__logger.addHandler(handler)
+    try:
+        Sampled().work()
+    finally:
+        Sampled._Sampled__logger.handlers[:] = []
+        Sampled._Sampled__logger.filters[:] = []
+    assert handler.lines == [ "work 0", "work 3 (2 similar records suppressed)" ]
+    assert logged(Sampled) is Sampled
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_json_formatter
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_json_formatter(logger):
+    handler = ListHandler()
+    handler.setFormatter(JsonFormatter(static = dict(app = "test")))
+    logger.addHandler(handler)
+    logger.info("value %s", Counted(1))
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("failed")
+    first, second = [ json.loads(line) for line in handler.lines ]
+    record = handler.records[0]
+    assert first == dict(
+        app = "test",
+        asctime = logging.Formatter().formatTime(record),
+        levelname = "INFO",
+        process = os.getpid(),
+        thread = threading.get_ident(),
+        threadName = "MainThread",
+        name = logger.name,
+        message = "value <Counted x=1>",
+    )
+    assert second["message"] == "failed" and "ZeroDivisionError" in second["exc_text"]
+    assert json.loads(JsonFormatter("short", datefmt = "%Y").format(record)) == dict(
+        asctime = logging.Formatter(datefmt = "%Y").formatTime(record, "%Y"), levelname = "INFO", name = logger.name, message = "value <Counted x=1>")
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_instrumented
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_instrumented(monkeypatch):
+    class Worker(object):
+        def work(self, n):
+            return n * 2
+        @staticmethod
+        def helper():
+            return 1
+        @classmethod
+        def build(cls):
+            return cls()
+        async def fetch(self):
+            await asyncio.sleep(0.01)
+            return 3
+        def __len__(self):
+            return 0
+    plain = dict(Worker.__dict__)
+    assert instrumented(Worker) is Worker
+    assert dict(Worker.__dict__) == plain
+    monkeypatch.setenv("SUTILS_INSTRUMENT", "1")
+    instrumented(Worker)
+    stats = Worker.__instrumentation__
+    assert sorted(stats) == [ 'build', 'fetch', 'helper', 'work' ]
+    worker = Worker.build()
+    assert [ worker.work(i) for i in range(3) ] == [ 0, 2, 4 ]
+    assert Worker.helper() == 1 and len(worker) == 0
+    assert asyncio.run(worker.fetch()) == 3
+    assert stats.work.count == 3 and sum(stats.work.histogram) == 3
+    assert stats.build.count == stats.helper.count == stats.fetch.count == 1
+    assert stats.fetch.min >= 0.01 and stats.fetch.histogram[5] == 1
+    assert INSTRUMENTED["Worker.work"] is stats.work
+    assert repr(stats.work).startswith("<MethodStats name='work', count=3, total=")
+    handler = ListHandler()
+    logging.getLogger("Worker").addHandler(handler)
+    try:
+        report_instrumentation(level = logging.WARNING, reset = True)
+    finally:
+        logging.getLogger("Worker").removeHandler(handler)
+        for name in stats:
+            del INSTRUMENTED["Worker." + name]
+    assert len(handler.lines) == 4 and handler.lines[0].startswith("work: count=3 ")
+    assert stats.work.count == 0
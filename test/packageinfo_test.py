@@ -0,0 +1,144 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: packageinfo_test.py
+# purpose: sutils.packageinfo tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import os
+import time
+import pytest
+
+from sutils.primitives import qdict
+from sutils import packageinfo, _binary
+from sutils.packageinfo import PackageInfo, PackageInfoWatcher
+
+
+# ---------------------------------------------------------------------------------------
+# fixtures
+# ---------------------------------------------------------------------------------------
+
+PACKAGE_YAML = """
+name: sample
+version: 1.0
+tier: prod
+db:
+  host: localhost
+  port: 5432
+tiers:
+  dev:
+    db:
+      host: dev.local
+  prod:
+    db:
+      host: prod.local
+    debug: false
+"""
+
+@pytest.fixture
+def package_home(tmp_path, monkeypatch):
+    monkeypatch.setattr(packageinfo, '_cache', {})
+    (tmp_path / 'package.yaml').write_text(PACKAGE_YAML)
+    return str(tmp_path)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_load_package_info
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_load_package_info(package_home):
+    info = PackageInfo(package_home)
+    assert info.name == 'sample' and info.debug is False
+    assert info.db == dict(host = 'prod.local', port = 5432)
+    assert type(info.db) is qdict
+    assert 'tiers' not in info
+    assert PackageInfo(package_home, tier = 'dev').db.host == 'dev.local'
+    assert PackageInfo(package_home, cache = False) == info
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_package_info_cache
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_package_info_cache(package_home, monkeypatch):
+    info = PackageInfo(package_home)
+    info.db.host = 'changed'
+    assert os.path.isfile(os.path.join(package_home, '.package.yaml.snapshot'))
+    merge = packageinfo._merge_package_info
+    monkeypatch.setattr(packageinfo, '_cache', {})
+    monkeypatch.setattr(packageinfo, '_merge_package_info', None)
+    assert PackageInfo(package_home).db.host == 'prod.local'
+    monkeypatch.setattr(packageinfo, '_merge_package_info', merge)
+    path = os.path.join(package_home, 'package.yaml')
+    with open(path, 'w') as f:
+        f.write(PACKAGE_YAML.replace('prod.local', 'prod2.local'))
+    assert PackageInfo(package_home).db.host == 'prod2.local'
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_package_info_forged_snapshot
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+EXECUTED = []
+
+class Exploit(object):
+    def __reduce__(self):
+        return (EXECUTED.append, (1,))
+
+def test_package_info_forged_snapshot(package_home):
+    path = os.path.join(package_home, 'package.yaml')
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    for forged in ( (stamp, Exploit()), (stamp, _binary.dumps(Exploit())) ):
+        with open(os.path.join(package_home, '.package.yaml.snapshot'), 'wb') as f:
+            _binary.dump(forged, f)
+        packageinfo._cache.clear()
+        assert PackageInfo(package_home).db.host == 'prod.local'
+    assert EXECUTED == []
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_package_info_tier_view
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_package_info_tier_view(package_home):
+    info = PackageInfo(package_home)
+    assert sorted(info.tier_names()) == ['dev', 'prod']
+    dev, prod, qa = info.tier_view('dev'), info.tier_view('prod'), info.tier_view('qa')
+    assert dev.db.host == 'dev.local' and dev.db.port == 5432 and dev.debug is True
+    assert prod.db.host == 'prod.local' and prod.debug is False
+    assert qa.db.host == 'localhost' and qa.package_home == package_home
+    assert info.tier_view('dev') is dev
+    # the base layer is shared by the views, not copied
+    assert dev.maps[2] is prod.maps[2] is qa.maps[1]
+    for tier in ('dev', 'prod', 'qa'):
+        assert info.tier_view(tier).flatten() == PackageInfo(package_home, tier = tier, cache = False)
+    assert os.path.isfile(os.path.join(package_home, '.package.yaml.layers.snapshot'))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_package_info_watcher
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_package_info_watcher(package_home):
+    path = os.path.join(package_home, 'package.yaml')
+    changes = []
+    with PackageInfoWatcher(package_home, interval = 0.01, on_change = changes.append) as watcher:
+        before = watcher.current
+        assert watcher.db.host == 'prod.local'
+        with open(path, 'w') as f:
+            f.write(PACKAGE_YAML.replace('prod.local', 'prod2.local'))
+        deadline = time.time() + 5
+        while watcher.current is before and time.time() < deadline:
+            time.sleep(0.01)
+        assert watcher.db.host == 'prod2.local'
+        assert before.db.host == 'prod.local'
+        assert changes == [ watcher.current ]
+        with open(path, 'w') as f:
+            f.write('db: [')
+        assert watcher.check() is False
+        assert watcher.db.host == 'prod2.local'
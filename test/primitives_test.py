@@ -0,0 +1,447 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: primitives_test.py
+# purpose: sutils.primitives tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import gc
+import json
+import asyncio
+import copy
+import types
+import weakref
+import threading
+import time
+import pickle
+import pytest
+
+from sutils import primitives, _json, _binary
+from sutils.primitives import NA, PrettyObject, cachedproperty, asynccachedproperty, qdict, fastqdict, layeredqdict, deeplayeredqdict, lazyqdict, lazyqlist, wrap_lazy
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_fastqdict_attribute_access
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_fastqdict_attribute_access():
+    d = fastqdict(a = 1)
+    d.b = 2
+    assert isinstance(d, qdict)
+    assert d == { 'a': 1, 'b': 2 }
+    assert d.a == d['a'] == 1
+    del d.a
+    assert 'a' not in d
+    with pytest.raises(AttributeError):
+        d.a
+    with pytest.raises(AttributeError):
+        del d.a
+    d['items'] = 3
+    assert d.items() == d.items() and d['items'] == 3
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_fastqdict_with_method_named_keys
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_fastqdict_with_method_named_keys():
+    d = fastqdict(items = [ 1, 2 ], keys = 'k', update = 3, a = 1)
+    assert d.a == 1 and callable(d.items) and d['items'] == [ 1, 2 ]
+    for other in (pickle.loads(pickle.dumps(d)), copy.copy(d), copy.deepcopy(d), d.copy(dict(b = 2)),
+            _binary.loads(_binary.dumps(d, buffer_callback = [].append)), qdict().update(d, True, True, True)):
+        assert dict.__getitem__(other, 'items') == [ 1, 2 ]
+    assert type(pickle.loads(pickle.dumps(d))) is fastqdict
+    assert json.loads(json.dumps(d)) == json.loads(_json.dumps(d)) == dict(d)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_fastqdict_is_freed_without_gc
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_fastqdict_is_freed_without_gc():
+    gc.disable()
+    try:
+        d = fastqdict(a = 1)
+        ref = weakref.ref(d)
+        del d
+        assert ref() is None
+    finally:
+        gc.enable()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_fastqdict_copy_and_pickle
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_fastqdict_copy_and_pickle():
+    d = fastqdict(a = 1, b = qdict(c = 2))
+    for other in (d.copy(), d + {}, copy.deepcopy(d), pickle.loads(pickle.dumps(d))):
+        assert type(other) is fastqdict
+        assert other == d
+        other.z = 1
+        assert other['z'] == 1
+        assert 'z' not in d
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_qdict_pickle_honours_subclass_customization
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class StatefulQdict(qdict):
+    def __getstate__(self):
+        return { '_version': 2 }
+
+class ReducedQdict(qdict):
+    def __reduce__(self):
+        return (qdict, (dict(self, reduced = True),))
+
+def test_qdict_pickle_honours_subclass_customization():
+    d = pickle.loads(pickle.dumps(qdict(a = 1)))
+    assert type(d) is qdict and d == { 'a': 1 }
+    d = pickle.loads(pickle.dumps(StatefulQdict(a = 1)))
+    assert type(d) is StatefulQdict and d == { 'a': 1 } and d._version == 2
+    d = pickle.loads(pickle.dumps(ReducedQdict(a = 1)))
+    assert type(d) is qdict and d == { 'a': 1, 'reduced': True }
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_qdict_update_recursive
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_qdict_update_recursive():
+    d = qdict(a = 1, b = dict(c = 2, d = dict(e = 3)), f = 4)
+    d.update(dict(b = dict(d = dict(g = 5), h = [ dict(i = 6), 7 ]), f = dict(j = 8)), recursive = True, convert_to_qdict = True)
+    assert d == dict(a = 1, b = dict(c = 2, d = dict(e = 3, g = 5), h = [ dict(i = 6), 7 ]), f = dict(j = 8))
+    assert type(d.b) is qdict and type(d.b.d) is qdict and type(d.f) is qdict
+    assert type(d.b.h[0]) is qdict
+    assert d.b.h[0].i == 6
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_qdict_update_recursive_without_add_keys
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_qdict_update_recursive_without_add_keys():
+    d = qdict(a = 1, b = qdict(c = 2))
+    d.update(dict(a = 10, b = dict(c = 20, x = 1), y = 2), recursive = True, add_keys = False)
+    assert d == dict(a = 10, b = dict(c = 20))
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_qdict_update_deep_document
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_qdict_update_deep_document():
+    depth = 5000
+    source = leaf = {}
+    for i in range(depth):
+        leaf['n'] = {}
+        leaf = leaf['n']
+    leaf['value'] = 1
+    d = qdict().update(source, recursive = True, convert_to_qdict = True)
+    node = d
+    for i in range(depth):
+        node = node.n
+    assert node.value == 1
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_layeredqdict
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_layeredqdict():
+    base = qdict(a = 1, b = 2)
+    conf = base.overlay(dict(b = 3))
+    assert isinstance(conf, layeredqdict)
+    assert conf.a == 1 and conf.b == 3
+    conf.c = 4
+    other = conf + dict(a = 5)
+    assert other.a == 5 and other.c == 4
+    assert base == dict(a = 1, b = 2)
+    assert conf == dict(a = 1, b = 3, c = 4)
+    flat = other.flatten()
+    assert type(flat) is qdict
+    assert flat == dict(a = 5, b = 3, c = 4)
+    del conf.c
+    with pytest.raises(AttributeError):
+        conf.c
+    assert qdict().update(other) == other.flatten() == dict(a = 5, b = 3)
+    assert qdict(x = 1).update(other, recursive = True) == dict(a = 5, b = 3, x = 1)
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_layeredqdict_nested_overrides
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_layeredqdict_nested_overrides():
+    base = qdict(db = qdict(host = 'localhost', port = 5432))
+    conf = base.overlay({ 'db': { 'port': 1 } })
+    assert type(conf.db) is qdict
+    assert conf.db == dict(port = 1)
+    assert type((conf + { 'cache': { 'size': 2 } }).cache) is qdict
+    deep = base.overlay({ 'db': { 'port': 1 } }, deep = True)
+    assert isinstance(deep, deeplayeredqdict)
+    assert deep.db.host == 'localhost' and deep.db.port == 1
+    assert base.db.port == 5432
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_deeplayeredqdict
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_deeplayeredqdict():
+    base = qdict(db = qdict(host = 'localhost', port = 5432, opts = qdict(ssl = False)), name = 'x')
+    tier = qdict(db = qdict(host = 'prod', opts = qdict(ssl = True)))
+    view = deeplayeredqdict(tier, base)
+    assert view.db.host == 'prod' and view.db.port == 5432 and view.db.opts.ssl is True
+    assert view.name == 'x'
+    assert deeplayeredqdict(qdict(db = 1), base).db == 1
+    expected = qdict().update(base, recursive = True, convert_to_qdict = True).update(tier, recursive = True, convert_to_qdict = True)
+    assert view.flatten() == expected
+    assert base.db.host == 'localhost'
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_lazyqdict
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_lazyqdict():
+    d = wrap_lazy(dict(a = dict(b = [ dict(c = 1), [ dict(d = 2) ] ]), e = 3))
+    assert type(d) is lazyqdict
+    assert type(dict.__getitem__(d, 'a')) is dict
+    a = d.a
+    assert type(a) is lazyqdict
+    assert d.a is a
+    assert a.b[0].c == 1
+    assert [ type(i) for i in a.b ] == [ lazyqdict, lazyqlist ]
+    assert a.b[1][0].d == 2
+    assert d.get('e') == 3 and d.get('x', 4) == 4
+    assert d == dict(a = dict(b = [ dict(c = 1), [ dict(d = 2) ] ]), e = 3)
+    for other in (wrap_lazy({ 'a': { 'b': 1 } }).copy(), wrap_lazy({ 'a': { 'b': 1 } }) + { 'c': 2 }):
+        assert type(other) is lazyqdict
+        assert other.a.b == 1
+    assert type(dict(wrap_lazy({ 'a': { 'b': 1 } }))['a']) is dict
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_cachedproperty
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class Counted(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.source = [ 1 ]
+
+    @cachedproperty
+    def legacy(self):
+        self.calls += 1
+
+    @cachedproperty(cache_none = True)
+    def cached_none(self):
+        self.calls += 1
+
+    @cachedproperty(depends_on = 'source')
+    def total(self):
+        self.calls += 1
+        return sum(self.source)
+
+
+def test_cachedproperty():
+    obj = Counted()
+    obj.legacy, obj.legacy
+    assert obj.calls == 2
+    obj.calls = 0
+    assert obj.cached_none is None and obj.cached_none is None
+    assert obj.calls == 1 and type(obj._cached_none) is primitives._CacheEntry
+    del obj.cached_none
+    obj.cached_none
+    assert obj.calls == 2
+    obj.cached_none = 5
+    assert obj.cached_none == 5 and obj.calls == 2
+
+
+class Preset(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.source = [ 1 ]
+        self._ttl = self._deps = self._single = None
+
+    @cachedproperty(ttl = 60)
+    def ttl(self):
+        self.calls += 1
+        return 1
+
+    @cachedproperty(depends_on = 'source')
+    def deps(self):
+        self.calls += 1
+        return 2
+
+    @cachedproperty(threadsafe = True)
+    def single(self):
+        self.calls += 1
+        return 3
+
+
+def test_cachedproperty_preset_none():
+    obj = Preset()
+    assert (obj.ttl, obj.deps, obj.single) == (1, 2, 3)
+    assert (obj.ttl, obj.deps, obj.single) == (1, 2, 3)
+    assert obj.calls == 3
+    obj.ttl = 4
+    assert obj.ttl == 4
+
+
+def test_cachedproperty_depends_on():
+    obj = Counted()
+    assert obj.total == 1 and obj.total == 1 and obj.calls == 1
+    obj.source.append(2)
+    assert obj.total == 1
+    obj.source = [ 1, 2 ]
+    assert obj.total == 3 and obj.calls == 2
+
+
+def test_cachedproperty_ttl(monkeypatch):
+    now = [ 100.0 ]
+    monkeypatch.setattr(primitives, 'time', types.SimpleNamespace(monotonic = lambda: now[0]))
+    class Clock(object):
+        calls = 0
+        @cachedproperty(ttl = 10)
+        def value(self):
+            self.calls += 1
+            return self.calls
+    obj = Clock()
+    assert obj.value == 1
+    now[0] += 9
+    assert obj.value == 1
+    now[0] += 2
+    assert obj.value == 2
+
+
+def test_cachedproperty_lru():
+    class Data(object):
+        pass
+    class Big(object):
+        calls = 0
+        @cachedproperty(lru = 2)
+        def data(self):
+            Big.calls += 1
+            return Data()
+    a, b, c = Big(), Big(), Big()
+    for obj in (a, b, a, c):
+        obj.data
+    assert Big.calls == 3 and '_data' not in vars(a)
+    a.data
+    assert Big.calls == 3
+    b.data
+    assert Big.calls == 4
+    # values of collected instances are dropped
+    value = weakref.ref(a.data)
+    del a
+    gc.collect()
+    assert value() is None
+    b.data = 'x'
+    assert b.data == 'x' and Big.calls == 4
+
+
+def test_cachedproperty_threadsafe():
+    started = threading.Event()
+    release = threading.Event()
+    class Slow(object):
+        calls = 0
+        @cachedproperty(threadsafe = True)
+        def value(self):
+            Slow.calls += 1
+            started.set()
+            release.wait(5)
+            return Slow.calls
+    obj = Slow()
+    results = []
+    threads = [ threading.Thread(target = lambda: results.append(obj.value)) for _ in range(8) ]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [ 1 ] * 8 and Slow.calls == 1
+    del obj.value
+    assert obj.value == 2
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_asynccachedproperty
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_asynccachedproperty():
+    class Service(object):
+        calls = 0
+        fail = True
+        @asynccachedproperty
+        async def conn(self):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            if self.fail:
+                self.fail = False
+                raise IOError("connect failed")
+            return "conn%d" % self.calls
+    async def main():
+        obj = Service()
+        with pytest.raises(IOError):
+            await obj.conn
+        assert obj._conn is NA
+        results = await asyncio.gather(*[ obj.conn for _ in range(10) ])
+        assert results == [ "conn2" ] * 10 and obj.calls == 2
+        assert await obj.conn == "conn2"
+        assert not isinstance(obj.conn, asyncio.Future)
+        obj.conn = "other"
+        assert await obj.conn == "other"
+        del obj.conn
+        assert await obj.conn == "conn3"
+    asyncio.run(main())
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_pretty_object_repr
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class Pretty(PrettyObject):
+    __pretty_format__ = PrettyObject.__PRETTY_FORMATS__.minimal
+    __pretty_fields__ = [ 'a', 'b:03d', 'class' ]
+    def __init__(self):
+        self.a, self.b = 'x', 7
+
+class PrettySlots(Pretty):
+    __slots__ = ( 'c', )
+    __pretty_fields__ = None
+
+class PrettyFailing(Pretty):
+    def __init__(self):
+        self.b = 7
+    @property
+    def a(self):
+        raise ValueError("broken")
+
+class PrettyCustom(Pretty):
+    def __repr__(self):
+        return "custom"
+
+class PrettyCustomChild(PrettyCustom):
+    __pretty_fields__ = [ 'a' ]
+
+
+def test_pretty_object_repr():
+    obj = Pretty()
+    assert repr(obj) == str(obj) == "<Pretty a='x', b=007, class=NA>"
+    assert repr(obj) == PrettyObject.__repr__(obj)
+    assert repr(PrettySlots()) == "<PrettySlots c=NA>"
+    assert repr(PrettyFailing()) == "<PrettyFailing a=ValueError('broken'), b=007, class=NA>"
+    assert repr(PrettyCustom()) == repr(PrettyCustomChild()) == str(PrettyCustomChild()) == "custom"
+    full = type('Full', (PrettyObject,), dict(__pretty_fields__ = [ 'a' ], a = 1))()
+    assert repr(full) == "<{}.Full object at 0x{:02x} a=1>".format(__name__, id(full))
@@ -0,0 +1,67 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: shared_utils_test.py
+# purpose: sutils.shared_utils tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import pytest
+
+from sutils.primitives import qdict, qlist, NA
+from sutils.shared_utils import sharedqdict, SharedQdictStore
+
+
+# ---------------------------------------------------------------------------------------
+# fixtures
+# ---------------------------------------------------------------------------------------
+
+@pytest.fixture
+def config():
+    return qdict(name = 'app', db = qdict(host = 'localhost', ports = qlist([ 1, 2 ]), extra = dict(na = NA)))
+
+
+def _check(root, config):
+    assert isinstance(root, sharedqdict)
+    assert root.name == 'app'
+    assert isinstance(root.db, sharedqdict)
+    assert root.db.ports == [ 1, 2 ] and type(root.db.ports) is qlist
+    assert root.db.extra.na is NA
+    assert root.db is root.db
+    assert root.to_qdict() == config
+    assert type(root.to_qdict().db) is qdict
+    with pytest.raises(TypeError):
+        root.name = 'other'
+    with pytest.raises(AttributeError):
+        root.missing
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_shared_memory
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_shared_memory(config):
+    store = SharedQdictStore.create(config)
+    try:
+        _check(store.root, config)
+        attached = SharedQdictStore.attach(store.name)
+        _check(attached.root, config)
+        attached.close()
+    finally:
+        store.close()
+        store.unlink()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_mapped_file
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_mapped_file(config, tmp_path):
+    path = str(tmp_path / 'config.sqd')
+    SharedQdictStore.write_file(config, path)
+    store = SharedQdictStore.open_file(path)
+    _check(store.root, config)
+    store.close()
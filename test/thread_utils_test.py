@@ -0,0 +1,188 @@
+# encoding: utf-8
+# author: Daniel Kovacs <mondomhogynincsen@gmail.com>
+# licence: MIT <https://opensource.org/licenses/MIT>
+# file: thread_utils_test.py
+# purpose: sutils.thread_utils tests
+# version: 1.0
+
+# ---------------------------------------------------------------------------------------
+# imports
+# ---------------------------------------------------------------------------------------
+
+import os
+import sys
+import asyncio
+import time
+import threading
+import subprocess
+import pytest
+
+from sutils import thread_utils
+from sutils.thread_utils import NonBlockingStreamReader, StreamMultiplexer, MultiplexedStreamReader, AsyncStreamReader
+
+
+# ---------------------------------------------------------------------------------------
+# fixtures
+# ---------------------------------------------------------------------------------------
+
+CHILD = "import sys\nfor i in range(1000): sys.stdout.write('line %d\\r\\n' % i)\nsys.stdout.write('last \\u00e9')"
+
+@pytest.fixture
+def multiplexer():
+    multiplexer = StreamMultiplexer()
+    yield multiplexer
+    multiplexer.close(5)
+
+
+def _read_all(reader, timeout = 5):
+    lines = []
+    deadline = time.time() + timeout
+    while not reader.eof and time.time() < deadline:
+        line = reader.readline(0.1)
+        if line is not None:
+            lines.append(line)
+    return lines
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_multiplexed_stream_reader
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+@pytest.mark.parametrize("text", [ True, False ])
+def test_multiplexed_stream_reader(multiplexer, text):
+    procs = [ subprocess.Popen([ sys.executable, "-c", CHILD ], stdout = subprocess.PIPE, universal_newlines = text, encoding = "utf-8" if text else None) for _ in range(5) ]
+    readers = [ multiplexer.reader(proc.stdout) for proc in procs ]
+    for proc, reader in zip(procs, readers):
+        lines = _read_all(reader)
+        proc.wait()
+        if text:
+            assert lines == [ "line %d\n" % i for i in range(1000) ] + [ "last é" ]
+        else:
+            assert lines == [ b"line %d\r\n" % i for i in range(1000) ] + [ "last é".encode("utf-8") ]
+        assert reader.readline() is None and reader.readline(0.01) is None
+        proc.stdout.close()
+
+
+def test_multiplexed_stream_reader_timeout_and_backpressure(multiplexer):
+    r, w = os.pipe()
+    with os.fdopen(r, "rb") as stream:
+        reader = MultiplexedStreamReader(stream, max_lines = 10, multiplexer = multiplexer)
+        assert reader.readline() is None
+        start = time.time()
+        assert reader.readline(0.05) is None
+        assert time.time() - start >= 0.04
+        threading.Timer(0.05, os.write, (w, b"a\n")).start()
+        assert reader.readline(5) == b"a\n"
+        # the reader stops reading when max_lines are waiting, the writer blocks on the full pipe
+        writer = threading.Thread(target = lambda: [ os.write(w, b"x" * 1023 + b"\n") for _ in range(2000) ])
+        writer.daemon = True
+        writer.start()
+        time.sleep(0.3)
+        assert 10 <= len(reader._lines) < 100 and writer.is_alive()
+        lines = [ reader.readline(5) for _ in range(2000) ]
+        assert lines == [ b"x" * 1023 + b"\n" ] * 2000
+        writer.join(5)
+        os.close(w)
+        assert reader.readline(5) is None and reader.eof
+
+
+def test_multiplexed_stream_reader_error(multiplexer):
+    bad_r, bad_w = os.pipe()
+    good_r, good_w = os.pipe()
+    with os.fdopen(bad_r, "r", encoding = "utf-8") as bad, os.fdopen(good_r, "rb") as good:
+        bad_reader = multiplexer.reader(bad)
+        good_reader = multiplexer.reader(good)
+        os.write(bad_w, b"\xff\n")
+        assert bad_reader.readline(5) is None
+        assert isinstance(bad_reader.error, UnicodeDecodeError) and bad_reader.eof
+        os.write(good_w, b"line\n")
+        assert good_reader.readline(5) == b"line\n"
+        assert multiplexer._thread.is_alive() and good_reader.error is None
+        os.close(bad_w)
+        os.close(good_w)
+
+
+def test_reader_close_after_multiplexer_close(tmp_path):
+    multiplexer = StreamMultiplexer()
+    r, w = os.pipe()
+    with os.fdopen(r, "rb") as stream:
+        reader = multiplexer.reader(stream)
+        multiplexer.close(5)
+        multiplexer.close(5)
+        # the fds of the wakeup pipe are free again, and likely reused here
+        path = tmp_path / "other"
+        with open(path, "wb"):
+            reader.close()
+            assert reader.readline(0.01) is None
+        assert path.read_bytes() == b""
+    os.close(w)
+
+
+def test_default_multiplexer_is_replaced_when_its_thread_died():
+    mux = thread_utils._get_default_multiplexer()
+    assert thread_utils._get_default_multiplexer() is mux
+    # stop the thread without closing
+    mux._call(None)
+    mux._thread.join(5)
+    other = thread_utils._get_default_multiplexer()
+    assert other is not mux and other._thread.is_alive()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_non_blocking_stream_reader():
+    # its thread dies raising UnexpectedEndOfStream at the end of the stream
+    proc = subprocess.Popen([ sys.executable, "-c", "print('hello')" ], stdout = subprocess.PIPE)
+    reader = NonBlockingStreamReader(proc.stdout)
+    assert reader.readline(5) == b"hello\n"
+    proc.wait()
+    reader._t.join(5)
+    assert reader.readline() is None
+    proc.stdout.close()
+
+
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+# test_async_stream_reader
+# +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+def test_async_stream_reader():
+    async def main():
+        threads = threading.active_count()
+        proc = subprocess.Popen([ sys.executable, "-c", CHILD ], stdout = subprocess.PIPE, universal_newlines = True, encoding = "utf-8")
+        reader = AsyncStreamReader(proc.stdout, max_lines = 100)
+        assert await reader.readline() == "line 0\n"
+        batch = []
+        while len(batch) < 10:
+            lines = await reader.read_lines(10 - len(batch))
+            assert 0 < len(lines) <= 10 - len(batch)
+            batch += lines
+        assert batch == [ "line %d\n" % i for i in range(1, 11) ]
+        lines = [ line async for line in reader ]
+        assert lines == [ "line %d\n" % i for i in range(11, 1000) ] + [ "last é" ]
+        assert reader.eof and await reader.readline() is None and await reader.read_lines(5) == []
+        assert threading.active_count() == threads
+        proc.wait()
+    asyncio.run(main())
+
+
+def test_async_stream_reader_timeout():
+    async def main():
+        r, w = os.pipe()
+        reader = AsyncStreamReader(os.fdopen(r, "rb"))
+        assert await reader.readline(0.05) is None and await reader.read_lines(timeout = 0.05) == []
+        asyncio.get_running_loop().call_later(0.05, os.write, w, b"a\nb\nc")
+        assert await reader.read_lines(5, timeout = 5) == [ b"a\n", b"b\n" ]
+        os.close(w)
+        assert await reader.read_lines(timeout = 5) == [ b"c" ]
+        assert await reader.read_lines(timeout = 5) == [] and reader.eof
+    asyncio.run(main())
+
+
+def test_async_stream_reader_decode_error():
+    async def main():
+        r, w = os.pipe()
+        reader = AsyncStreamReader(os.fdopen(r, "r", encoding = "utf-8"))
+        os.write(w, b"\xff\n")
+        assert await reader.readline(5) is None
+        assert isinstance(reader.error, UnicodeDecodeError) and reader.eof
+        os.close(w)
+    asyncio.run(main())